@@ -0,0 +1,118 @@
+# job_alert_bot/alerts.py
+
+import dataclasses
+from config import TELEGRAM_MESSAGE_LIMIT
+from jobs import Job
+
+# Delivery modes a user can pick with /mode
+DELIVERY_MODE_INSTANT = "instant"  # One message per matching job
+DELIVERY_MODE_DIGEST = "digest"  # All of a run's matches in as few messages as possible
+DELIVERY_MODES = (DELIVERY_MODE_INSTANT, DELIVERY_MODE_DIGEST)
+
+# Characters that open an entity in Telegram's Markdown; a stray one makes the whole message fail to parse
+_MARKDOWN_ESCAPES = str.maketrans({char: "\\" + char for char in "_*`["})
+
+
+def message_length(text: str) -> int:
+    """Returns the length of a message as Telegram counts it, in UTF-16 code units."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def escape_markdown(text: str | None) -> str:
+    """Escapes scraped or user-supplied text so Telegram's Markdown shows it as is."""
+    return str(text or "").translate(_MARKDOWN_ESCAPES)
+
+
+def _markdown_url(url: str) -> str:
+    """Keeps a URL from closing the link it is placed in early."""
+    return url.replace(")", "%29")
+
+
+def format_job_alert(job: Job, keywords: list[str]) -> str:
+    """Formats a single job alert, listing every keyword it matched."""
+    return (
+        f"📢 **New Job Alert: {escape_markdown(', '.join(keywords))}**\n\n"
+        f"**Title:** {escape_markdown(job.title)}\n"
+        f"**Company:** {escape_markdown(job.company)}\n"
+        f"**Source:** {escape_markdown(job.source)}\n\n"
+        f"[View Job]({_markdown_url(job.link)})"
+    )
+
+
+def format_digest_entry(job: Job, keywords: list[str]) -> str:
+    """Formats one job as a compact digest entry."""
+    return (
+        f"• **{escape_markdown(job.title)}** - {escape_markdown(job.company)} ({escape_markdown(job.source)})\n"
+        f"   Matched: {escape_markdown(', '.join(keywords))}\n"
+        f"   [View Job]({_markdown_url(job.link)})\n"
+    )
+
+
+def format_search_results(header: str, jobs: list[Job]) -> str:
+    """Formats a page of search results under a header."""
+    entries = "".join(
+        f"• **{escape_markdown(job.title)}** - {escape_markdown(job.company)} ({escape_markdown(job.source)})\n"
+        f"   [View Job]({_markdown_url(job.link)})\n\n"
+        for job in jobs
+    )
+    text = (header + entries).rstrip()
+    if message_length(text) > TELEGRAM_MESSAGE_LIMIT:
+        text = _truncate(text, TELEGRAM_MESSAGE_LIMIT)
+    return text
+
+
+def build_digest_messages(matches: list[tuple[Job, list[str]]], limit: int = TELEGRAM_MESSAGE_LIMIT) -> list[str]:
+    """
+    Packs a user's matches into digest messages that each fit Telegram's length limit.
+
+    Args:
+        matches (list): (job, matched keywords) pairs, each job appearing once.
+        limit (int): The maximum message length in UTF-16 code units.
+
+    Returns:
+        list: The digest messages, in order.
+    """
+    header = f"📬 **Job Digest: {len(matches)} new job{'s' if len(matches) != 1 else ''}**\n\n"
+    continued = "📬 **Job Digest (continued)**\n\n"
+
+    messages = []
+    current = header
+    for job, keywords in matches:
+        entry = format_digest_entry(job, keywords) + "\n"
+        if message_length(current) + message_length(entry) > limit and current not in (header, continued):
+            messages.append(current.rstrip())
+            current = continued
+        # A single oversized entry is shortened rather than dropped
+        room = limit - message_length(current)
+        if message_length(entry) > room:
+            entry = _fit_digest_entry(job, keywords, room)
+        current += entry
+
+    if current not in (header, continued):
+        messages.append(current.rstrip())
+    return messages
+
+
+def _fit_digest_entry(job: Job, keywords: list[str], limit: int) -> str:
+    """
+    Shortens a job's title until its digest entry fits within limit UTF-16 code
+    units, so the cut never lands inside the Markdown around it.
+    """
+    title = job.title
+    while True:
+        entry = format_digest_entry(dataclasses.replace(job, title=title), keywords) + "\n"
+        overflow = message_length(entry) - limit
+        if overflow <= 0:
+            return entry
+        if len(title) <= 1:
+            # The rest of the entry is too long by itself; the notifier sends it as plain text if it no longer parses
+            return _truncate(entry, limit)
+        title = _truncate(title, max(1, message_length(title) - overflow))
+
+
+def _truncate(text: str, limit: int) -> str:
+    """Cuts text so it fits within limit UTF-16 code units, marking the cut with an ellipsis."""
+    text = text[:limit - 1]
+    while text and message_length(text) > limit - 1:
+        text = text[:-1]
+    return text + "…"
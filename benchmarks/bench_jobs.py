@@ -0,0 +1,100 @@
+# job_alert_bot/benchmarks/bench_jobs.py
+#
+# Compares the memory a scrape run holds per job as a plain dict, the way
+# scrapers used to return them, and as a jobs.Job record.
+#
+# Run from the project root:
+#   python -m benchmarks.bench_jobs [--jobs N]
+#
+# Jobs arrive in pages decoded from JSON, so like parsed HTML or an API
+# response every string is a fresh object, including company and source names
+# repeated on every page. The footprint counts everything the run keeps
+# alive: the records themselves and the strings they hold, measured with
+# tracemalloc after the page buffers are dropped. Build times include the
+# tracemalloc overhead, so only compare them with each other.
+
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from benchmarks.bench_matcher import WORDS, make_titles
+from jobs import Job
+
+# --- CONFIGURATION FOR THIS BENCHMARK ---
+JOB_COUNTS = [10_000, 100_000, 500_000]
+PAGE_SIZE = 100
+# Distinct employers across the run; a few big ones post most of the jobs
+COMPANY_COUNT = 2_000
+SOURCES = ["RemoteOK (API)", "WeWorkRemotely"]
+SEED = 42
+
+
+def as_dict(record: list) -> dict:
+    job_id, title, company, link, source = record
+    return {"id": job_id, "title": title, "company": company, "link": link, "source": source}
+
+
+def as_job(record: list) -> Job:
+    return Job(*record)
+
+
+def make_pages(rng: random.Random, job_count: int) -> list[str]:
+    """Generates JSON pages of [id, title, company, link, source] records."""
+    companies = [f"{' '.join(rng.sample(WORDS, 2)).title()} {index}" for index in range(COMPANY_COUNT)]
+    weights = [1 / (rank + 1) for rank in range(COMPANY_COUNT)]
+    titles = make_titles(rng, job_count)
+    employers = rng.choices(companies, weights=weights, k=job_count)
+    pages = []
+    for first in range(0, job_count, PAGE_SIZE):
+        pages.append(json.dumps([
+            [
+                f"remoteok_{1_000_000 + index}",
+                titles[index],
+                employers[index],
+                f"https://remoteok.com/remote-jobs/{1_000_000 + index}",
+                SOURCES[index % len(SOURCES)],
+            ]
+            for index in range(first, min(first + PAGE_SIZE, job_count))
+        ]))
+    return pages
+
+
+def measure(pages: list[str], build) -> tuple[int, float, list]:
+    """Builds every page's jobs, returning the bytes they keep alive, the build time and the jobs."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    jobs = []
+    for page in pages:
+        jobs.extend(build(record) for record in json.loads(page))
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return retained, elapsed, jobs
+
+
+def main(job_counts: list[int]):
+    rng = random.Random(SEED)
+    print(f"{'jobs':>8} {'format':>6} | {'B/job':>6} {'object B':>8} {'MiB':>8} {'build (s)':>9}")
+    for job_count in job_counts:
+        pages = make_pages(rng, job_count)
+        for name, build in (("dict", as_dict), ("Job", as_job)):
+            retained, elapsed, jobs = measure(pages, build)
+            print(
+                f"{job_count:>8} {name:>6} | {retained / job_count:>6.0f} {sys.getsizeof(jobs[0]):>8} "
+                f"{retained / 2**20:>8.1f} {elapsed:>9.3f}"
+            )
+            del jobs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the memory held per scraped job.")
+    parser.add_argument("--jobs", type=int, nargs="+", default=JOB_COUNTS, help="Job counts to measure")
+    args = parser.parse_args()
+    main(args.jobs)
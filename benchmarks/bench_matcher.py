@@ -0,0 +1,77 @@
+# job_alert_bot/benchmarks/bench_matcher.py
+#
+# Compares KeywordMatcher against the nested `keyword in title` loop it replaced.
+# Run from the project root: python -m benchmarks.bench_matcher
+
+import random
+import string
+import time
+
+from matcher import KeywordMatcher
+
+# --- CONFIGURATION FOR THIS BENCHMARK ---
+# (number of keywords, number of job titles)
+GRID = [(10, 1_000), (100, 10_000), (1_000, 10_000), (5_000, 20_000)]
+SEED = 42
+
+WORDS = [
+    "python", "django", "react", "senior", "junior", "engineer", "developer", "data",
+    "backend", "frontend", "full stack", "devops", "golang", "rust", "manager", "designer",
+    "product", "support", "writer", "marketing", "sales", "analyst", "scientist", "ml",
+]
+
+
+def make_keywords(rng: random.Random, count: int) -> list[str]:
+    """Generates a mix of real-looking keywords and random fragments."""
+    keywords = set(WORDS[:count])
+    while len(keywords) < count:
+        if rng.random() < 0.5:
+            keywords.add(" ".join(rng.sample(WORDS, 2)))
+        else:
+            keywords.add("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))))
+    return list(keywords)
+
+
+def make_titles(rng: random.Random, count: int) -> list[str]:
+    """Generates job titles of a few capitalised words each."""
+    return [" ".join(rng.choices(WORDS, k=rng.randint(2, 6))).title() for _ in range(count)]
+
+
+def nested_loop(keywords: list[str], titles: list[str]) -> list[list[str]]:
+    """The original scheduler.job_processor matching loop."""
+    results = []
+    for title in titles:
+        title_lower = title.lower()
+        results.append([keyword for keyword in keywords if keyword.lower() in title_lower])
+    return results
+
+
+def automaton(keywords: list[str], titles: list[str]) -> list[list[str]]:
+    """The KeywordMatcher replacement, including the one-off build cost."""
+    matcher = KeywordMatcher(keywords)
+    return [matcher.match(title) for title in titles]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    rng = random.Random(SEED)
+    print(f"{'keywords':>8} {'titles':>8} {'nested (s)':>11} {'matcher (s)':>12} {'speedup':>8}")
+    for keyword_count, title_count in GRID:
+        keywords = make_keywords(rng, keyword_count)
+        titles = make_titles(rng, title_count)
+
+        expected, nested_time = timed(nested_loop, keywords, titles)
+        actual, matcher_time = timed(automaton, keywords, titles)
+        if actual != expected:
+            raise AssertionError("KeywordMatcher results differ from the nested loop")
+
+        print(f"{keyword_count:>8} {title_count:>8} {nested_time:>11.3f} {matcher_time:>12.3f} {nested_time / matcher_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# job_alert_bot/benchmarks/bench_notifier.py
+#
+# Measures how the NotificationDispatcher shares its send budget when one chat
+# has a burst of alerts and many others have a few each, with the real
+# per-chat spacing (bench_pipeline turns it off to time the rest of the pipeline).
+#
+# Run from the project root:
+#   python -m benchmarks.bench_notifier [--heavy N] [--chats N] [--per-chat N] [--interval SECONDS]
+#
+# The heavy chat's messages are queued first, the way an instant-mode user with
+# many matches used to be. The light chats should still get their messages
+# at close to the global rate, instead of waiting behind the heavy chat's
+# per-chat interval. Sends go to a fake Bot that only records when they happen.
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from config import NOTIFY_GLOBAL_RATE, NOTIFY_PER_CHAT_INTERVAL, NOTIFY_WORKERS
+from notifier import NotificationDispatcher
+
+# --- CONFIGURATION FOR THIS BENCHMARK ---
+HEAVY_CHAT_MESSAGES = 60
+LIGHT_CHATS = 50
+LIGHT_CHAT_MESSAGES = 3
+HEAVY_CHAT_ID = 1
+
+
+class RecordingBot:
+    """Stands in for aiogram's Bot, remembering when each chat's messages were sent."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.sends: dict[int, list[float]] = {}
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.sends.setdefault(chat_id, []).append(time.monotonic() - self.started)
+
+
+async def main(heavy: int, chats: int, per_chat: int, interval: float):
+    bot = RecordingBot()
+    dispatcher = NotificationDispatcher(bot, per_chat_interval=interval)
+    dispatcher.start()
+
+    for number in range(heavy):
+        await dispatcher.enqueue(HEAVY_CHAT_ID, f"heavy {number}")
+    light_chat_ids = range(HEAVY_CHAT_ID + 1, HEAVY_CHAT_ID + 1 + chats)
+    for number in range(per_chat):
+        for chat_id in light_chat_ids:
+            await dispatcher.enqueue(chat_id, f"light {number}")
+
+    # Stop once the light chats are served; the heavy chat is paced by its interval regardless
+    light_total = chats * per_chat
+    while sum(len(bot.sends.get(chat_id, ())) for chat_id in light_chat_ids) < light_total:
+        await asyncio.sleep(0.05)
+    elapsed = time.monotonic() - bot.started
+    await dispatcher.stop()
+
+    first_sends = [bot.sends[chat_id][0] for chat_id in light_chat_ids]
+    sent = sum(len(times) for times in bot.sends.values())
+    ideal = (light_total + len(bot.sends[HEAVY_CHAT_ID])) / NOTIFY_GLOBAL_RATE
+    print(
+        f"{NOTIFY_WORKERS} workers, {NOTIFY_GLOBAL_RATE} msg/s global, {interval}s per chat; "
+        f"1 chat x {heavy} messages queued ahead of {chats} chats x {per_chat}"
+    )
+    print(f"light chats served in   {elapsed:6.2f}s (global rate alone needs {ideal:.2f}s)")
+    print(f"first light message     median {statistics.median(first_sends):.2f}s, max {max(first_sends):.2f}s")
+    print(f"heavy chat sent         {len(bot.sends[HEAVY_CHAT_ID]):6d} of {heavy}")
+    print(f"throughput              {sent / elapsed:6.1f} msg/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dispatcher fairness with one heavy chat.")
+    parser.add_argument("--heavy", type=int, default=HEAVY_CHAT_MESSAGES, help="Messages queued for the heavy chat")
+    parser.add_argument("--chats", type=int, default=LIGHT_CHATS, help="Number of light chats")
+    parser.add_argument("--per-chat", type=int, default=LIGHT_CHAT_MESSAGES, help="Messages per light chat")
+    parser.add_argument("--interval", type=float, default=NOTIFY_PER_CHAT_INTERVAL, help="Seconds between messages to one chat")
+    args = parser.parse_args()
+    asyncio.run(main(args.heavy, args.chats, args.per_chat, args.interval))
@@ -0,0 +1,260 @@
+# job_alert_bot/benchmarks/bench_pipeline.py
+#
+# Runs the full scrape -> match -> notify pipeline against generated feeds.
+# RemoteOK-style JSON and WeWorkRemotely-style HTML are served through an
+# httpx MockTransport, alerts go to a fake Bot that only records them, and
+# every grid point gets its own temporary SQLite file and response cache.
+#
+# Run from the project root:
+#   python -m benchmarks.bench_pipeline [--quick] [--no-tracemalloc] [--slow-source SECONDS]
+#
+# Each grid point is run twice on fresh databases: "batch" scrapes everything
+# before matching (scrape_sites + process_jobs), "stream" matches each page as
+# it arrives (job_processor). --slow-source delays the RemoteOK feed to show
+# how much one slow source holds back the first alert in each mode.
+#
+# Peak memory is measured with tracemalloc, which slows Python code down
+# noticeably; pass --no-tracemalloc for cleaner timings. Large pages are
+# parsed in the parser process pool, whose memory tracemalloc cannot see.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import httpx
+
+import database as db
+import response_cache
+import scheduler
+import scraper
+from benchmarks.bench_matcher import make_keywords, make_titles
+from alerts import DELIVERY_MODE_INSTANT
+from cssselectors import SELECTORS
+import metrics
+from notifier import NotificationDispatcher
+from parsing import close_executor, extract_page, get_executor
+
+# --- CONFIGURATION FOR THIS BENCHMARK ---
+# (number of keywords, number of scraped jobs, number of users)
+GRID = [
+    (10, 100, 10),
+    (100, 1_000, 100),
+    (1_000, 10_000, 1_000),
+    (10_000, 100_000, 10_000),
+]
+QUICK_GRID = GRID[:2]
+SUBSCRIPTIONS_PER_USER = 3
+# Share of users switched to instant alerts; the rest get digests
+INSTANT_USER_SHARE = 0.5
+SEED = 42
+
+# The pipeline logs every URL and run; only problems matter here. Set at import
+# time so parser worker processes, which re-import this module, are quiet too.
+logging.disable(logging.WARNING)
+
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises"]
+
+
+class FakeBot:
+    """Stands in for aiogram's Bot, recording messages instead of sending them."""
+
+    def __init__(self):
+        self.sent = 0
+        self.chats = set()
+        self.first_sent_at = None
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        if self.first_sent_at is None:
+            self.first_sent_at = time.perf_counter()
+        self.sent += 1
+        self.chats.add(chat_id)
+
+
+def make_remoteok_feed(titles: list[str], first_id: int) -> str:
+    """Builds a RemoteOK API response, newest job first, behind the usual legal notice."""
+    jobs = [{"legal": "Generated for benchmarking."}]
+    for offset, title in enumerate(titles):
+        job_id = first_id + len(titles) - offset
+        jobs.append({
+            "id": str(job_id),
+            "position": title,
+            "company": COMPANIES[job_id % len(COMPANIES)],
+            "url": f"https://remoteok.com/remote-jobs/{job_id}",
+        })
+    return json.dumps(jobs)
+
+
+def make_wework_page(jobs: list[tuple[int, str]]) -> str:
+    """Builds a WeWorkRemotely search results page from (id, title) pairs."""
+    cards = "".join(
+        f'<li class="feature" id="job_{job_id}">'
+        f'<a href="/remote-jobs/{job_id}">'
+        f'<span class="company">{COMPANIES[job_id % len(COMPANIES)]}</span>'
+        f'<span class="title">{title}</span>'
+        f'</a></li>'
+        for job_id, title in jobs
+    )
+    return f'<html><body><section class="jobs"><ul>{cards}</ul></section></body></html>'
+
+
+def make_feeds(rng: random.Random, keywords: list[str], job_count: int, slow_source: float = 0.0) -> httpx.MockTransport:
+    """
+    Returns a transport serving one RemoteOK feed with half the jobs, and one
+    WeWorkRemotely search page per keyword sharing the other half. The RemoteOK
+    feed is delayed by slow_source seconds.
+    """
+    titles = make_titles(rng, job_count)
+    remoteok_titles, wework_titles = titles[:job_count // 2], titles[job_count // 2:]
+    remoteok_body = make_remoteok_feed(remoteok_titles, first_id=1_000_000)
+
+    wework_jobs = [(2_000_000 + i, title) for i, title in enumerate(wework_titles)]
+    wework_pages = {
+        keyword: make_wework_page(wework_jobs[i::len(keywords)])
+        for i, keyword in enumerate(keywords)
+    }
+    remoteok_host = httpx.URL(SELECTORS["remoteok"]["url"]).host
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == remoteok_host:
+            await asyncio.sleep(slow_source)
+            return httpx.Response(200, text=remoteok_body, headers={"Content-Type": "application/json"})
+        page = wework_pages.get(request.url.params.get("term", ""))
+        if page is None:
+            return httpx.Response(404)
+        return httpx.Response(200, text=page, headers={"Content-Type": "text/html"})
+
+    return httpx.MockTransport(handler)
+
+
+async def subscribe_users(rng: random.Random, keywords: list[str], user_count: int):
+    """Gives every keyword at least one subscriber, then tops users up to SUBSCRIPTIONS_PER_USER keywords."""
+    pairs = {(index % user_count, keyword) for index, keyword in enumerate(keywords)}
+    for user_id in range(user_count):
+        for keyword in rng.sample(keywords, min(SUBSCRIPTIONS_PER_USER, len(keywords))):
+            pairs.add((user_id, keyword))
+    # Concurrent writes share group commits, so seeding stays quick
+    await asyncio.gather(*(db.add_subscription(user_id, keyword) for user_id, keyword in pairs))
+    instant_users = rng.sample(range(user_count), int(user_count * INSTANT_USER_SHARE))
+    await asyncio.gather(*(db.set_delivery_mode(user_id, DELIVERY_MODE_INSTANT) for user_id in instant_users))
+    return len(pairs)
+
+
+async def run_point(keyword_count: int, job_count: int, user_count: int, streaming: bool, slow_source: float) -> dict:
+    """Runs the pipeline once for a grid point and returns its measurements."""
+    rng = random.Random(SEED)
+    keywords = sorted(make_keywords(rng, keyword_count))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db.DATABASE_PATH = os.path.join(workdir, "bench.db")
+        response_cache.HTTP_CACHE_DIR = os.path.join(workdir, "http_cache")
+        await db.initialize_db()
+        subscriptions = await subscribe_users(rng, keywords, user_count)
+
+        await scraper.close_client()
+        scraper._client = httpx.AsyncClient(transport=make_feeds(rng, keywords, job_count, slow_source))
+
+        bot = FakeBot()
+        # Unthrottled, so the numbers show the pipeline rather than Telegram's limits
+        dispatcher = NotificationDispatcher(bot, rate=1e9, per_chat_interval=0)
+        dispatcher.start()
+        before = metrics.totals()
+
+        start = time.perf_counter()
+        if streaming:
+            # Scraping and matching overlap, so they can't be timed separately
+            await scheduler.job_processor(bot, dispatcher)
+            scraped = matched = time.perf_counter()
+        else:
+            jobs, urls = await scraper.scrape_sites()
+            scraped = time.perf_counter()
+            await scheduler.process_jobs(jobs, urls, bot, dispatcher)
+            matched = time.perf_counter()
+        await dispatcher.join()
+        delivered = time.perf_counter()
+
+        after = metrics.totals()
+        jobs_seen = sum(
+            after[name] - before[name] for name in ("pipeline_jobs_new_total", "pipeline_jobs_deduplicated_total")
+        )
+
+        # A second run over unchanged feeds, served from watermarks and the response cache
+        await scheduler.job_processor(bot, dispatcher)
+        rerun = time.perf_counter() - delivered
+
+        await dispatcher.stop()
+        await scheduler.flush_delivered()
+        await scraper.close_client()
+        await db.close_db()
+
+    return {
+        "subscriptions": subscriptions,
+        "jobs": jobs_seen,
+        "scrape": None if streaming else scraped - start,
+        "match": None if streaming else matched - scraped,
+        "deliver": delivered - matched,
+        "total": delivered - start,
+        "first_alert": bot.first_sent_at - start if bot.first_sent_at else None,
+        "rerun": rerun,
+        "messages": bot.sent,
+        "users": len(bot.chats),
+        "rate": bot.sent / (delivered - start) if delivered > start else 0.0,
+    }
+
+
+def _seconds(value: float | None) -> str:
+    return f"{value:>7.2f}" if value is not None else f"{'-':>7}"
+
+
+async def warm_up_parsers():
+    """Starts the parser pool and imports the scrapers in it, so no grid point pays for process startup."""
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    workers = getattr(executor, "_max_workers", 1)
+    await asyncio.gather(*(
+        loop.run_in_executor(executor, extract_page, f"scrapers.{selectors.get('module', site)}", "[]", selectors)
+        for site, selectors in SELECTORS.items()
+        for _ in range(workers)
+    ))
+
+
+async def main(grid: list[tuple[int, int, int]], trace_memory: bool, slow_source: float):
+    await warm_up_parsers()
+    print(
+        f"{'keywords':>8} {'jobs':>7} {'users':>6} {'subs':>6} {'mode':>6} | {'scrape':>7} {'match':>7} {'deliver':>7} "
+        f"{'total':>7} {'1st msg':>7} {'rerun':>7} | {'msgs':>6} {'msg/s':>9} {'peak MiB':>9}"
+    )
+    for keyword_count, job_count, user_count in grid:
+        for streaming in (False, True):
+            if trace_memory:
+                tracemalloc.start()
+            result = await run_point(keyword_count, job_count, user_count, streaming, slow_source)
+            peak = "-"
+            if trace_memory:
+                peak = f"{tracemalloc.get_traced_memory()[1] / 2**20:.1f}"
+                tracemalloc.stop()
+
+            if result["jobs"] != job_count:
+                raise AssertionError(f"Processed {result['jobs']} jobs, expected {job_count}")
+            print(
+                f"{keyword_count:>8} {job_count:>7} {user_count:>6} {result['subscriptions']:>6} "
+                f"{'stream' if streaming else 'batch':>6} | "
+                f"{_seconds(result['scrape'])} {_seconds(result['match'])} {_seconds(result['deliver'])} "
+                f"{_seconds(result['total'])} {_seconds(result['first_alert'])} {_seconds(result['rerun'])} | "
+                f"{result['messages']:>6} {result['rate']:>9.0f} {peak:>9}"
+            )
+    close_executor()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scrape -> match -> notify pipeline.")
+    parser.add_argument("--quick", action="store_true", help="Only run the smallest grid points")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Skip peak memory tracking")
+    parser.add_argument("--slow-source", type=float, default=0.0, metavar="SECONDS", help="Delay the RemoteOK feed")
+    args = parser.parse_args()
+    asyncio.run(main(QUICK_GRID if args.quick else GRID, not args.no_tracemalloc, args.slow_source))
@@ -0,0 +1,125 @@
+# job_alert_bot/benchmarks/bench_search.py
+#
+# Measures /search and /subscribe backfill latency against the full-text index
+# on a jobs table of generated postings, next to the LIKE scan it avoids.
+#
+# Run from the project root:
+#   python -m benchmarks.bench_search [--rows N] [--repeat N]
+#
+# Rows are inserted through database.add_posted_jobs, so the insert rate
+# includes keeping the index in sync. Each query is timed for its first page,
+# for the tenth page reached by following cursors, and as a title-only match
+# the way a new subscription is backfilled.
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import database as db
+from benchmarks.bench_matcher import make_titles
+from benchmarks.bench_pipeline import COMPANIES
+from config import SEARCH_PAGE_SIZE
+from jobs import Job
+
+# --- CONFIGURATION FOR THIS BENCHMARK ---
+ROWS = 1_000_000
+REPEAT = 50
+INSERT_CHUNK = 50_000
+SEED = 42
+# Share of titles given a rare word, so rare and common terms can be compared
+RARE_WORD = "zig"
+RARE_SHARE = 0.0001
+QUERIES = ["python", "data engineer", "senior backend developer", RARE_WORD, "globex", "nosuchword"]
+
+logging.disable(logging.WARNING)
+
+
+def percentile(samples: list[float], share: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+async def fill_jobs(rows: int) -> float:
+    """Inserts generated jobs in chunks and returns the rows per second."""
+    rng = random.Random(SEED)
+    start = time.perf_counter()
+    for first in range(0, rows, INSERT_CHUNK):
+        titles = make_titles(rng, min(INSERT_CHUNK, rows - first))
+        await db.add_posted_jobs([
+            Job(
+                id=f"bench_{first + offset}",
+                title=f"{title} {RARE_WORD.title()}" if rng.random() < RARE_SHARE else title,
+                company=COMPANIES[(first + offset) % len(COMPANIES)],
+                link=f"https://example.com/jobs/{first + offset}",
+                source="bench",
+            )
+            for offset, title in enumerate(titles)
+        ])
+    return rows / (time.perf_counter() - start)
+
+
+async def time_search(query: str, repeat: int, title_only: bool = False, pages: int = 1) -> list[float]:
+    """Times reaching the given page of results, following cursors from the first page."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        before = None
+        for _ in range(pages):
+            _, before = await db.search_jobs(query, before=before, title_only=title_only)
+            if before is None:
+                break
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def time_like_scan(query: str, repeat: int) -> list[float]:
+    """Times the first page found with a LIKE scan over titles and companies, the way it worked without the index."""
+    pattern = f"%{query}%"
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await db._fetchall(
+            "SELECT id, job_id, title, company, link, source FROM jobs "
+            "WHERE title LIKE ? OR company LIKE ? ORDER BY id DESC LIMIT ?",
+            (pattern, pattern, SEARCH_PAGE_SIZE + 1)
+        )
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _ms(samples: list[float]) -> str:
+    return f"{statistics.median(samples) * 1000:>8.2f} {percentile(samples, 0.95) * 1000:>8.2f}"
+
+
+async def main(rows: int, repeat: int):
+    with tempfile.TemporaryDirectory() as workdir:
+        db.DATABASE_PATH = os.path.join(workdir, "bench.db")
+        await db.initialize_db()
+        rate = await fill_jobs(rows)
+        size = os.path.getsize(db.DATABASE_PATH) / 2**20
+        print(f"Inserted {rows} jobs at {rate:,.0f} rows/s with the index kept in sync ({size:.0f} MiB).")
+        print(f"Latency in ms (median, p95) over {repeat} runs, {SEARCH_PAGE_SIZE} results per page:")
+        print(
+            f"{'query':>26} | {'page 1':>17} | {'page 10':>17} | {'title only':>17} | {'LIKE scan':>17}"
+        )
+        for query in QUERIES:
+            first = await time_search(query, repeat)
+            tenth = await time_search(query, repeat, pages=10)
+            titles = await time_search(query, repeat, title_only=True)
+            # The scan can take seconds per query, so it is run fewer times
+            like = await time_like_scan(query, max(1, repeat // 10))
+            print(f"{query:>26} | {_ms(first)} | {_ms(tenth)} | {_ms(titles)} | {_ms(like)}")
+        await db.close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark full-text job search.")
+    parser.add_argument("--rows", type=int, default=ROWS, help="Jobs to generate")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="Runs per query")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
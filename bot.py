@@ -1,10 +1,83 @@
 import asyncio
 import logging
+import signal
+from aiohttp import web
 from aiogram import Bot, Dispatcher
-from config import TELEGRAM_BOT_TOKEN, LOGGING_LEVEL
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from config import (
+    TELEGRAM_BOT_TOKEN, TELEGRAM_API_SERVER, LOGGING_LEVEL, BOT_MODE, WEBHOOK_BASE_URL, WEBHOOK_PATH,
+    WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_REGISTER, WEBHOOK_SHUTDOWN_TIMEOUT, METRICS_PORT,
+    WORKERS_ENABLED
+)
 from handlers import router
-from database import initialize_db
-from scheduler import setup_scheduler, job_processor
+from database import initialize_db, close_db, get_unfinished_runs
+from scheduler import setup_scheduler, resume_runs, flush_delivered
+from scraper import close_client
+from parsing import close_executor
+from notifier import NotificationDispatcher
+from metrics import handle_metrics, start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+def create_bot() -> Bot:
+    """Creates the Bot, talking to TELEGRAM_API_SERVER instead of api.telegram.org if it is set."""
+    session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_SERVER)) if TELEGRAM_API_SERVER else None
+    return Bot(token=TELEGRAM_BOT_TOKEN, session=session)
+
+async def handle_health(request: web.Request) -> web.Response:
+    """Liveness endpoint for load balancers and container health checks."""
+    return web.json_response({"status": "ok"})
+
+def build_webhook_app(bot: Bot, dp: Dispatcher) -> web.Application:
+    """
+    Builds the aiohttp application that receives updates from Telegram.
+
+    Updates are handled before the response is sent, so shutting the server
+    down waits for them instead of dropping them.
+    """
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=False,
+        secret_token=WEBHOOK_SECRET or None,
+    ).register(app, path=WEBHOOK_PATH)
+    app.router.add_get("/healthz", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    setup_application(app, dp, bot=bot)
+    return app
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    """Serves the webhook until SIGINT/SIGTERM, then drains in-flight updates."""
+    if WEBHOOK_REGISTER:
+        if not WEBHOOK_BASE_URL:
+            raise RuntimeError("WEBHOOK_BASE_URL must be set to register the webhook.")
+        await bot.set_webhook(f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}", secret_token=WEBHOOK_SECRET or None)
+        logger.info(f"Webhook registered at {WEBHOOK_BASE_URL}{WEBHOOK_PATH}")
+    if not WEBHOOK_SECRET:
+        logger.warning("WEBHOOK_SECRET is not set; anyone who finds the webhook URL can post updates.")
+
+    runner = web.AppRunner(build_webhook_app(bot, dp))
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT, shutdown_timeout=WEBHOOK_SHUTDOWN_TIMEOUT).start()
+    logger.info(f"Webhook server listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Not available on Windows; Ctrl+C still raises KeyboardInterrupt there
+            pass
+    try:
+        await stop.wait()
+    finally:
+        # The webhook is left registered so other replicas keep receiving updates
+        logger.info("Stopping webhook server...")
+        await runner.cleanup()
 
 async def main():
     """The main function to initialize and run the bot."""
@@ -13,27 +86,68 @@ async def main():
         level=getattr(logging, LOGGING_LEVEL.upper(), logging.INFO),
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
-    logger = logging.getLogger(__name__)
 
     # Initialize the database
     await initialize_db()
 
     # Initialize the bot and dispatcher
-    bot = Bot(token=TELEGRAM_BOT_TOKEN)
+    bot = create_bot()
     dp = Dispatcher()
 
     # Include the command handlers router
     dp.include_router(router)
-    
-    # Start the scheduler
-    setup_scheduler(bot)
 
-    logger.info("Bot is starting...")
-    # Start polling for updates from Telegram
-    await dp.start_polling(bot)
+    notification_dispatcher = None
+    resume_task = None
+    job_scheduler = None
+    if WORKERS_ENABLED:
+        # Scraping, matching and delivery run in worker.py processes
+        logger.info("Worker mode enabled; this process only handles commands.")
+    else:
+        # Start delivering alerts in the background, independently of scraping
+        notification_dispatcher = NotificationDispatcher(bot)
+        notification_dispatcher.start()
+
+        # Send what a run cut short by the last shutdown matched but never delivered,
+        # in the background so commands are answered meanwhile
+        resume_task = asyncio.create_task(resume_runs(bot, notification_dispatcher, await get_unfinished_runs()))
+
+        # Start the scheduler
+        job_scheduler = setup_scheduler(bot, notification_dispatcher)
+
+    logger.info(f"Bot is starting in {BOT_MODE} mode...")
+    metrics_runner = None
+    try:
+        if BOT_MODE == "webhook":
+            # /metrics is served by the webhook server
+            await run_webhook(bot, dp)
+        else:
+            if METRICS_PORT:
+                metrics_runner = await start_metrics_server()
+            # Start polling for updates from Telegram
+            await dp.start_polling(bot)
+    finally:
+        if job_scheduler is not None:
+            # Stop scheduling before anything below is closed; runs in progress are
+            # cancelled and finished from the run journal on the next start
+            job_scheduler.shutdown(wait=False)
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        if resume_task is not None:
+            resume_task.cancel()
+            await asyncio.gather(resume_task, return_exceptions=True)
+        if notification_dispatcher is not None:
+            await notification_dispatcher.stop()
+            # Alerts still queued stay undelivered in the outbox and are sent on the next start
+            await flush_delivered()
+        # Release pooled scraper connections, parser workers, database connections and the bot session on shutdown
+        await close_client()
+        close_executor()
+        await close_db()
+        await bot.session.close()
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except (KeyboardInterrupt, SystemExit):
-        logging.info("Bot stopped manually.")
\ No newline at end of file
+        logging.info("Bot stopped manually.")
@@ -6,19 +6,194 @@ load_dotenv()
 
 # --- Telegram Bot Configuration ---
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "YOUR_TELEGRAM_BOT_TOKEN")
+# Optional Bot API server to talk to instead of api.telegram.org (e.g. a local server or a stub)
+TELEGRAM_API_SERVER = os.getenv("TELEGRAM_API_SERVER", "")
+
+# --- Update Delivery Configuration ---
+# "polling" keeps a long-poll connection open; "webhook" runs an HTTP server Telegram posts updates to
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Public HTTPS base URL Telegram should call, e.g. https://bot.example.com
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Telegram sends this back in X-Telegram-Bot-Api-Secret-Token; requests without it are rejected
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+# Set to "false" to skip setWebhook on startup, e.g. when replaying recorded updates locally
+WEBHOOK_REGISTER = os.getenv("WEBHOOK_REGISTER", "true").lower() == "true"
+# Seconds to wait for in-flight updates when shutting down
+WEBHOOK_SHUTDOWN_TIMEOUT = 30.0
 
 # --- Database Configuration ---
 DATABASE_PATH = "job_alerts.db"
 
+# Number of pooled read connections; all writes go through one connection
+DB_READ_POOL_SIZE = 4
+# Page cache per connection, in KiB
+DB_CACHE_SIZE_KB = 8192
+# Prepared statements kept per connection
+DB_STATEMENT_CACHE_SIZE = 256
+# Writes arriving within this window (seconds) are committed in one transaction
+DB_COMMIT_INTERVAL = 0.01
+# Posted jobs older than this many days are forgotten (0 keeps them forever).
+# Keep it well above how long a listing stays up, or an old job could be sent again.
+JOB_RETENTION_DAYS = 90
+# How often (hours) expired jobs are pruned and freed pages returned to the OS
+PRUNE_INTERVAL_HOURS = 24
+# Free pages released per incremental vacuum
+DB_VACUUM_PAGES = 2000
+# "full" stores each posted job's ID, title, company and link. "hash" only stores a
+# 64-bit hash of the ID, which keeps the dedup table and the in-memory set small.
+DEDUP_MODE = "full"
+
+# --- Search Configuration ---
+# Jobs per page of /search results and of the recent matches shown after /subscribe.
+# Search reads the jobs table, so it needs DEDUP_MODE = "full".
+SEARCH_PAGE_SIZE = 5
+# Show recent matching jobs as soon as someone subscribes, instead of waiting for the next run
+SUBSCRIBE_BACKFILL = True
+
 # --- Scraping Configuration ---
 # User-Agent to use for HTTP requests to avoid being blocked
 HTTP_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 }
 
+# Connection pool shared by every scraper for the lifetime of the bot
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+HTTP_KEEPALIVE_EXPIRY = 30.0  # seconds
+
+# HTTP/2 needs the optional 'h2' package (pip install "httpx[http2]")
+HTTP2_ENABLED = False
+
+# Defaults for sources that don't set "timeout" / "max_concurrency" in cssselectors.py
+HTTP_TIMEOUT = 15.0  # seconds
+HTTP_PER_HOST_CONCURRENCY = 4
+
+# Retries for 429/5xx answers and network errors, for sources that don't set "retries".
+# Waits grow exponentially from the base delay with random jitter, and never less than Retry-After.
+HTTP_RETRIES = 3
+HTTP_RETRY_BASE_DELAY = 0.5  # seconds
+HTTP_RETRY_MAX_DELAY = 30.0  # seconds; a longer Retry-After gives up until the next run
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Once a host has HTTP_LATENCY_MIN_SAMPLES responses, its timeout becomes
+# HTTP_TIMEOUT_MULTIPLIER x its recent HTTP_TIMEOUT_PERCENTILE latency, capped by
+# the source's "timeout", so a hanging request to a fast host fails early
+HTTP_ADAPTIVE_TIMEOUT = True
+HTTP_TIMEOUT_PERCENTILE = 0.99
+HTTP_TIMEOUT_MULTIPLIER = 3.0
+HTTP_TIMEOUT_MIN = 2.0  # seconds
+HTTP_LATENCY_WINDOW = 200  # responses remembered per host
+HTTP_LATENCY_MIN_SAMPLES = 20
+
+# Hedged requests: when a response takes longer than the host's HTTP_HEDGE_PERCENTILE
+# latency, a second identical request is sent and the first answer wins. Sources
+# can opt in or out with "hedge" in cssselectors.py.
+HTTP_HEDGE_ENABLED = False
+HTTP_HEDGE_PERCENTILE = 0.95
+
+# After this many failed requests in a row a host is skipped for CIRCUIT_RESET_TIMEOUT
+# seconds, then a single probe decides whether it is back
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 60.0
+
+# Results pages scraped per URL for sources with "pagination" in cssselectors.py, unless they set "max_pages"
+PAGINATION_MAX_PAGES = 5
+
+# On-disk cache of ETag/Last-Modified/content hash per URL, so unchanged pages are skipped.
+# Sources can opt out with "cache": False in cssselectors.py.
+HTTP_CACHE_ENABLED = True
+HTTP_CACHE_DIR = ".http_cache"
+HTTP_CACHE_MAX_AGE = 7 * 24 * 3600  # seconds; older entries are ignored and evicted
+HTTP_CACHE_MAX_ENTRIES = 10000
+HTTP_CACHE_EVICT_INTERVAL = 300  # seconds between scans for entries to evict
+
+# Snapshot archive of source responses, for profiling and checking parsers offline.
+# "record" saves every response fetched during real runs to SNAPSHOT_DIR; "replay"
+# serves fetches from a recorded session instead of the network. Empty disables both.
+SNAPSHOT_MODE = os.getenv("SNAPSHOT_MODE", "")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+# Session to record into or replay; empty starts a new timestamped session or replays the latest
+SNAPSHOT_SESSION = os.getenv("SNAPSHOT_SESSION", "")
+# "fast" serves replayed responses at once; "original" serves each one when it finished in the recording
+SNAPSHOT_REPLAY_TIMING = os.getenv("SNAPSHOT_REPLAY_TIMING", "fast")
+
+# Default HTML parser backend for sources that don't set "parser" in cssselectors.py.
+# One of "html.parser", "lxml" or "selectolax"; unavailable backends fall back to "html.parser".
+HTML_PARSER = "lxml"
+
+# Where scrapers parse responses: "process" (a ProcessPoolExecutor), "thread" or "inline"
+PARSE_EXECUTOR = "process"
+# Worker count for the parser pool; None uses one per CPU
+PARSE_WORKERS = None
+# Responses smaller than this (characters) are parsed inline, where a worker round trip would cost more
+PARSE_INLINE_THRESHOLD = 64 * 1024
+
+# --- Notification Configuration ---
+# Concurrent sender workers
+NOTIFY_WORKERS = 8
+# Messages per second across the whole bot (Telegram allows about 30)
+NOTIFY_GLOBAL_RATE = 30
+# Messages that may go out at once after an idle spell, on top of NOTIFY_GLOBAL_RATE;
+# keep it small, since Telegram counts any one second, not the average
+NOTIFY_BURST = 1
+# Minimum seconds between two messages to the same chat
+NOTIFY_PER_CHAT_INTERVAL = 1.0
+# Retries for unexpected send errors before a message is dropped
+NOTIFY_MAX_RETRIES = 3
+# Matching waits when this many messages are already waiting to be sent
+NOTIFY_QUEUE_SIZE = 10000
+# How often (seconds) the dispatcher logs throughput and drop counts
+NOTIFY_STATS_INTERVAL = 60
+# Telegram rejects messages longer than this (in UTF-16 code units)
+TELEGRAM_MESSAGE_LIMIT = 4096
+# "digest" groups a run's matches per user, "instant" sends one message per job.
+# Users can override this with /mode.
+DEFAULT_DELIVERY_MODE = "digest"
+
 # --- Scheduler Configuration ---
-# Time for the daily scraping job to run (in UTC)
-SCHEDULED_JOB_TIME = "10:00"
+# Defaults for sources that don't set "interval_minutes" / "jitter_seconds" in cssselectors.py
+SCRAPE_INTERVAL_MINUTES = 60
+SCRAPE_JITTER_SECONDS = 300
+# Scraped pages waiting to be matched; scrapers pause when this many are queued
+STREAM_QUEUE_SIZE = 16
+# A run that starts later than this (seconds) after its scheduled time is skipped
+SCHEDULER_MISFIRE_GRACE_TIME = 300
+# Finished runs and their delivered alerts are kept in the run journal for this many days
+RUN_JOURNAL_RETENTION_DAYS = 7
+
+# --- Worker Mode Configuration ---
+# When true, bot.py only answers commands; scraping, matching and delivery run in
+# separate processes started with worker.py, coordinating through SQLite.
+WORKERS_ENABLED = os.getenv("WORKERS_ENABLED", "false").lower() == "true"
+# Seconds a claimed task stays hidden from other workers; if its worker dies, it is retried after this
+WORK_VISIBILITY_TIMEOUT = 300
+# A task claimed this many times without completing is left aside for inspection
+WORK_MAX_ATTEMPTS = 5
+# A failed scrape is retried after this many seconds times its attempt number
+WORK_RETRY_DELAY = 30
+# Seconds a worker sleeps when its queue is empty
+WORK_POLL_INTERVAL = 2.0
+# After an unexpected error a worker waits WORK_POLL_INTERVAL, doubling with each
+# further error in a row up to this many seconds, instead of exiting
+WORK_ERROR_BACKOFF_MAX = 60.0
+# Tasks a worker claims at once, per queue
+WORK_SCRAPE_BATCH = 8
+WORK_MATCH_BATCH = 64
+WORK_NOTIFY_BATCH = 100
+# Alerts are split into this many queues by chat, one per notifier worker, so each
+# chat is only ever sent to by one process. Each notifier gets NOTIFY_GLOBAL_RATE / shards.
+WORK_NOTIFY_SHARDS = 1
+# The matcher holding this lock schedules runs; others stand by until it lapses (seconds)
+LEADER_LOCK_TTL = 30
+
+# --- Metrics Configuration ---
+# Prometheus metrics are served at /metrics. In webhook mode they share the webhook
+# server; in polling mode a small server is started on this port (0 disables it).
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9090"))
 
 # --- Logging Configuration ---
 LOGGING_LEVEL = "DEBUG"
\ No newline at end of file
@@ -2,6 +2,10 @@ SELECTORS = {
     "remoteok": {
         "type": "api", 
         "url": "https://remoteok.com/api",
+        "timeout": 20.0,
+        "max_concurrency": 2,
+        "interval_minutes": 30,  # How often this source is scraped
+        "jitter_seconds": 120,  # Random offset added to each run
         # The CSS selectors below are no longer needed for this scraper
         # "job_card": "tr.job",
         # "title": "h2[itemprop='title']",
@@ -11,7 +15,21 @@ SELECTORS = {
     },
     "weworkremotely": {
         "type": "html",
+        "module": "wework",  # Scraper module in scrapers/, when it differs from the source name
         "url": "https://weworkremotely.com/remote-jobs/search?term={keyword}",
+        "timeout": 15.0,
+        "max_concurrency": 4,
+        "interval_minutes": 60,
+        "jitter_seconds": 300,
+        "parser": "lxml",  # "html.parser", "lxml" or "selectolax"
+        # Later results pages, fetched concurrently. Use "next_link": "<css selector>" instead
+        # of "param" for boards that only link to the next page.
+        "pagination": {
+            "param": "page",  # Query parameter holding the page number
+            "page_size": 25,  # A shorter page is the last one
+            "max_pages": 3,
+            "stop_at_known": True,  # Stop at a page holding a job seen in an earlier run
+        },
         "job_card": "li.feature",
         "title": "span.title",
         "company": "span.company",
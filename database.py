@@ -1,14 +1,182 @@
+import asyncio
 import aiosqlite
+import hashlib
+import json
 import logging
-from config import DATABASE_PATH
+import re
+import time
+import uuid
+from contextlib import asynccontextmanager
+import metrics
+from jobs import Job
+from config import (
+    DATABASE_PATH, DB_READ_POOL_SIZE, DB_CACHE_SIZE_KB, DB_COMMIT_INTERVAL, DB_STATEMENT_CACHE_SIZE,
+    JOB_RETENTION_DAYS, DB_VACUUM_PAGES, DEDUP_MODE, WORK_VISIBILITY_TIMEOUT, WORK_MAX_ATTEMPTS, SEARCH_PAGE_SIZE,
+    RUN_JOURNAL_RETENTION_DAYS
+)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Job IDs known to be in the jobs table (or their hashes, in compact dedup mode),
+# loaded at startup. A hit here is authoritative; a miss is confirmed against
+# SQLite, since another process may have recorded the job since we loaded the set.
+_posted_job_ids: set[str | int] = set()
+
+# Subscriptions in both directions, loaded at startup and updated after every
+# successful write, so reads are served from memory. Every change also bumps a
+# version row in SQLite; when it moves past the version the index was loaded at,
+# another process (a webhook replica or the bot, seen from a worker) changed
+# subscriptions and the index is reloaded before the next read.
+_keyword_users: dict[str, set[int]] = {}
+_user_keywords: dict[int, set[str]] = {}
+_subscriptions_version = 0
+# Bumped whenever a keyword gains its first subscriber or loses its last one
+_keywords_version = 0
+
+# Keep bulk queries under SQLite's default host-parameter limit
+_MAX_QUERY_PARAMS = 500
+
+# --- Connection Management ---
+# One long-lived connection owns all writes, a small pool serves reads.
+_writer: aiosqlite.Connection | None = None
+_readers: asyncio.Queue | None = None
+_reader_connections: list[aiosqlite.Connection] = []
+_write_lock = asyncio.Lock()
+_connect_lock = asyncio.Lock()
+
+# Writes issued within DB_COMMIT_INTERVAL of each other share one commit
+_commit_waiter: asyncio.Future | None = None
+_flush_task: asyncio.Task | None = None
+
+
+async def _open_connection() -> aiosqlite.Connection:
+    """Opens a connection with the pragmas every connection should share."""
+    # sqlite3 keeps a per-connection cache of prepared statements, which
+    # only pays off now that connections outlive a single query
+    conn = await aiosqlite.connect(DATABASE_PATH, cached_statements=DB_STATEMENT_CACHE_SIZE)
+    # executescript steps every pragma to completion, so no statement is left holding a lock
+    await conn.executescript(f"""
+        PRAGMA busy_timeout = 5000;
+        PRAGMA synchronous = NORMAL;
+        PRAGMA cache_size = -{DB_CACHE_SIZE_KB};
+        PRAGMA temp_store = MEMORY;
+    """)
+    return conn
+
+
+async def _ensure_connected():
+    """Opens the write connection and the read pool on first use."""
+    global _writer, _readers
+    if _writer is not None:
+        return
+    async with _connect_lock:
+        if _writer is not None:
+            return
+        writer = await _open_connection()
+        # WAL lets the read pool keep serving while the writer commits
+        await writer.executescript("PRAGMA journal_mode = WAL;")
+
+        readers = asyncio.Queue()
+        for _ in range(DB_READ_POOL_SIZE):
+            conn = await _open_connection()
+            _reader_connections.append(conn)
+            readers.put_nowait(conn)
+
+        _writer, _readers = writer, readers
+    logger.info(f"Database connections opened ({DB_READ_POOL_SIZE} readers, 1 writer).")
+
+
+async def close_db():
+    """Flushes pending writes and closes every database connection."""
+    global _writer, _readers, _flush_task, _write_lock
+    if _writer is None:
+        return
+    if _flush_task is not None:
+        await asyncio.gather(_flush_task, return_exceptions=True)
+        _flush_task = None
+
+    await _writer.commit()
+    await _writer.close()
+    for conn in _reader_connections:
+        await conn.close()
+    _reader_connections.clear()
+    _writer, _readers = None, None
+    _write_lock = asyncio.Lock()
+    logger.info("Database connections closed.")
+
+
+@asynccontextmanager
+async def _reader():
+    """Borrows a connection from the read pool."""
+    await _ensure_connected()
+    conn = await _readers.get()
+    try:
+        yield conn
+    finally:
+        _readers.put_nowait(conn)
+
+
+async def _fetchall(sql: str, params=()):
+    """Runs a read query on a pooled connection and returns all rows."""
+    async with _reader() as conn:
+        with metrics.timer("db_query_seconds", op="read"):
+            async with conn.execute(sql, params) as cursor:
+                return await cursor.fetchall()
+
+
+async def _flush(waiter: asyncio.Future):
+    """Commits everything written since the waiter was created."""
+    global _commit_waiter
+    await asyncio.sleep(DB_COMMIT_INTERVAL)
+    async with _write_lock:
+        if _commit_waiter is waiter:
+            _commit_waiter = None
+        try:
+            with metrics.timer("db_query_seconds", op="commit"):
+                await _writer.commit()
+            waiter.set_result(None)
+        except Exception as e:
+            waiter.set_exception(e)
+
+
+async def _commit():
+    """Waits until pending writes are committed, grouping concurrent writers into one transaction."""
+    global _commit_waiter, _flush_task
+    waiter = _commit_waiter
+    if waiter is None:
+        waiter = _commit_waiter = asyncio.get_running_loop().create_future()
+        _flush_task = asyncio.ensure_future(_flush(waiter))
+    await asyncio.shield(waiter)
+
+
+async def _execute_write(sql: str, params=()) -> int:
+    """Runs one write statement and returns its row count once it is committed."""
+    await _ensure_connected()
+    async with _write_lock:
+        with metrics.timer("db_query_seconds", op="write"):
+            async with _writer.execute(sql, params) as cursor:
+                rowcount = cursor.rowcount
+    await _commit()
+    return rowcount
+
+
+async def _execute_write_many(sql: str, seq_of_params):
+    """Runs a write statement for every parameter set and waits for the commit."""
+    await _ensure_connected()
+    async with _write_lock:
+        with metrics.timer("db_query_seconds", op="write"):
+            await _writer.executemany(sql, seq_of_params)
+    await _commit()
+
+
+# --- Schema ---
+
 async def initialize_db():
     """Initializes the database and creates tables if they don't exist."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        await db.execute("""
+    await _ensure_connected()
+    async with _write_lock:
+        await _writer.execute("""
             CREATE TABLE IF NOT EXISTS subscriptions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER NOT NULL,
@@ -16,29 +184,259 @@ async def initialize_db():
                 UNIQUE(user_id, keyword)
             )
         """)
-        await db.execute("""
+        await _writer.execute("""
+            CREATE TABLE IF NOT EXISTS subscriptions_version (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                version INTEGER NOT NULL
+            )
+        """)
+        await _writer.execute("INSERT OR IGNORE INTO subscriptions_version (id, version) VALUES (0, 0)")
+        await _enable_incremental_vacuum()
+        await _writer.execute("""
             CREATE TABLE IF NOT EXISTS jobs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 job_id TEXT UNIQUE NOT NULL,
                 title TEXT NOT NULL,
                 company TEXT,
                 link TEXT NOT NULL,
-                source TEXT NOT NULL
+                source TEXT NOT NULL,
+                first_seen INTEGER NOT NULL DEFAULT 0
             )
         """)
-        await db.commit()
-    logger.info("Database initialized successfully.")
+        await _migrate_jobs_first_seen()
+        await _writer.execute("CREATE INDEX IF NOT EXISTS idx_jobs_first_seen ON jobs (first_seen)")
+        await _create_jobs_search_index()
+        # Compact dedup mode: one 64-bit hash per job, clustered on the hash itself
+        await _writer.execute("""
+            CREATE TABLE IF NOT EXISTS job_hashes (
+                hash INTEGER PRIMARY KEY,
+                first_seen INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        await _writer.execute("CREATE INDEX IF NOT EXISTS idx_job_hashes_first_seen ON job_hashes (first_seen)")
+        if DEDUP_MODE == "hash":
+            await _migrate_to_job_hashes()
+        await _writer.execute("""
+            CREATE TABLE IF NOT EXISTS source_watermarks (
+                url TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                watermark INTEGER NOT NULL,
+                updated_at INTEGER NOT NULL
+            )
+        """)
+        await _writer.execute("""
+            CREATE TABLE IF NOT EXISTS user_settings (
+                user_id INTEGER PRIMARY KEY,
+                delivery_mode TEXT NOT NULL
+            )
+        """)
+        # Durable work queue shared by worker processes. A claimed task is hidden
+        # until available_at, so a worker that dies lets it reappear for another.
+        await _writer.execute("""
+            CREATE TABLE IF NOT EXISTS work_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                queue TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                dedup_key TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                lease_token TEXT,
+                created_at REAL NOT NULL,
+                UNIQUE(queue, dedup_key)
+            )
+        """)
+        await _writer.execute("CREATE INDEX IF NOT EXISTS idx_work_queue_available ON work_queue (queue, available_at)")
+        await _writer.execute("""
+            CREATE TABLE IF NOT EXISTS leader_locks (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        # Journal of job runs, and the alerts each one matched. A run's alerts are
+        # written with the jobs they were matched on and marked delivered as they
+        # go out, so a run cut short by a crash can be finished on the next start.
+        await _writer.execute("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT,
+                status TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                finished_at REAL,
+                jobs_scraped INTEGER NOT NULL DEFAULT 0,
+                jobs_new INTEGER NOT NULL DEFAULT 0,
+                alerts INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        await _writer.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                job TEXT NOT NULL,
+                keywords TEXT NOT NULL,
+                digest INTEGER NOT NULL,
+                delivered_at REAL
+            )
+        """)
+        await _writer.execute("CREATE INDEX IF NOT EXISTS idx_outbox_run ON outbox (run_id, delivered_at)")
+        await _writer.commit()
+
+    table, column = _dedup_table()
+    rows = await _fetchall(f"SELECT {column} FROM {table}")
+    _posted_job_ids.clear()
+    _posted_job_ids.update(row[0] for row in rows)
+
+    count = await refresh_subscriptions()
+    logger.info(
+        f"Database initialized successfully. {len(_posted_job_ids)} posted jobs and "
+        f"{count} subscriptions loaded."
+    )
+
+async def _enable_incremental_vacuum():
+    """Switches the database to incremental auto-vacuum, so pruning can give pages back without a full VACUUM."""
+    async with _writer.execute("PRAGMA auto_vacuum") as cursor:
+        mode = (await cursor.fetchone())[0]
+    if mode != 2:
+        # Only takes effect on an existing database after one full VACUUM
+        logger.info("Enabling incremental auto-vacuum; this rewrites the database once.")
+        await _writer.executescript("PRAGMA auto_vacuum = INCREMENTAL; VACUUM;")
+
+async def _migrate_jobs_first_seen():
+    """Adds first_seen to a jobs table created before it existed, dating existing rows to now."""
+    async with _writer.execute("PRAGMA table_info(jobs)") as cursor:
+        columns = [row[1] for row in await cursor.fetchall()]
+    if "first_seen" not in columns:
+        await _writer.execute("ALTER TABLE jobs ADD COLUMN first_seen INTEGER NOT NULL DEFAULT 0")
+        await _writer.execute("UPDATE jobs SET first_seen = strftime('%s', 'now')")
+        logger.info("Added first_seen to the jobs table.")
+
+async def _create_jobs_search_index():
+    """
+    Creates the full-text index over job titles and companies. It stores no text
+    of its own, reading it from the jobs table, and triggers keep it in sync with
+    every insert and delete there, including add_posted_job(s) and pruning.
+    """
+    async with _writer.execute("SELECT 1 FROM sqlite_master WHERE name = 'jobs_fts'") as cursor:
+        exists = await cursor.fetchone() is not None
+    await _writer.executescript("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+            title, company, content='jobs', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS jobs_fts_insert AFTER INSERT ON jobs BEGIN
+            INSERT INTO jobs_fts (rowid, title, company) VALUES (new.id, new.title, new.company);
+        END;
+        CREATE TRIGGER IF NOT EXISTS jobs_fts_delete AFTER DELETE ON jobs BEGIN
+            INSERT INTO jobs_fts (jobs_fts, rowid, title, company) VALUES ('delete', old.id, old.title, old.company);
+        END;
+        CREATE TRIGGER IF NOT EXISTS jobs_fts_update AFTER UPDATE ON jobs BEGIN
+            INSERT INTO jobs_fts (jobs_fts, rowid, title, company) VALUES ('delete', old.id, old.title, old.company);
+            INSERT INTO jobs_fts (rowid, title, company) VALUES (new.id, new.title, new.company);
+        END;
+    """)
+    if not exists:
+        # Index the jobs recorded before the index existed
+        await _writer.execute("INSERT INTO jobs_fts (jobs_fts) VALUES ('rebuild')")
+        logger.info("Built the full-text index over posted jobs.")
+
+async def _migrate_to_job_hashes():
+    """Seeds the compact dedup table from the jobs table the first time compact mode is used."""
+    async with _writer.execute("SELECT 1 FROM job_hashes LIMIT 1") as cursor:
+        if await cursor.fetchone():
+            return
+    await _writer.create_function("job_hash", 1, job_hash, deterministic=True)
+    async with _writer.execute(
+        "INSERT OR IGNORE INTO job_hashes (hash, first_seen) SELECT job_hash(job_id), first_seen FROM jobs"
+    ) as cursor:
+        if cursor.rowcount > 0:
+            logger.info(f"Copied {cursor.rowcount} posted jobs into the compact dedup table.")
+
+# --- Subscriptions ---
+
+def _index_subscription(user_id: int, keyword: str):
+    """Adds a subscription to the in-memory index."""
+    global _keywords_version
+    if keyword not in _keyword_users:
+        _keyword_users[keyword] = set()
+        _keywords_version += 1
+    _keyword_users[keyword].add(user_id)
+    _user_keywords.setdefault(user_id, set()).add(keyword)
+
+def _unindex_subscription(user_id: int, keyword: str):
+    """Removes a subscription from the in-memory index, dropping keywords and users left with none."""
+    global _keywords_version
+    users = _keyword_users.get(keyword)
+    if users is not None:
+        users.discard(user_id)
+        if not users:
+            del _keyword_users[keyword]
+            _keywords_version += 1
+    keywords = _user_keywords.get(user_id)
+    if keywords is not None:
+        keywords.discard(keyword)
+        if not keywords:
+            del _user_keywords[user_id]
+
+async def refresh_subscriptions() -> int:
+    """Reloads the subscription index from SQLite. Returns the number of subscriptions."""
+    global _keywords_version, _subscriptions_version
+    # Read the version first: a change landing in between only costs another reload
+    version_rows = await _fetchall("SELECT version FROM subscriptions_version")
+    rows = await _fetchall("SELECT user_id, keyword FROM subscriptions")
+    _subscriptions_version = version_rows[0][0]
+    keywords, version = set(_keyword_users), _keywords_version
+    _keyword_users.clear()
+    _user_keywords.clear()
+    for user_id, keyword in rows:
+        _index_subscription(user_id, keyword)
+    # Only a changed keyword set should cost a matcher rebuild
+    _keywords_version = version + (set(_keyword_users) != keywords)
+    return len(rows)
+
+async def _sync_subscriptions():
+    """Reloads the subscription index if another process changed subscriptions since it was loaded."""
+    rows = await _fetchall("SELECT version FROM subscriptions_version")
+    if rows[0][0] != _subscriptions_version:
+        count = await refresh_subscriptions()
+        logger.info(f"Subscriptions changed in another process; reloaded {count}.")
+
+async def _write_subscription(sql: str, params) -> int:
+    """
+    Adds or removes a subscription, bumping the subscriptions version in the same
+    transaction. Returns the row count once it is committed.
+    """
+    global _subscriptions_version
+    await _ensure_connected()
+    version = None
+    async with _write_lock:
+        with metrics.timer("db_query_seconds", op="write"):
+            async with _writer.execute(sql, params) as cursor:
+                rowcount = cursor.rowcount
+            if rowcount > 0:
+                async with _writer.execute(
+                    "UPDATE subscriptions_version SET version = version + 1 WHERE id = 0 RETURNING version"
+                ) as cursor:
+                    version = (await cursor.fetchone())[0]
+    await _commit()
+    # If nobody else changed subscriptions in between, the index stays current
+    # once the caller applies this change; otherwise the next read reloads it
+    if version == _subscriptions_version + 1:
+        _subscriptions_version = version
+    return rowcount
+
+def get_keywords_version() -> int:
+    """Returns a number that changes whenever the set of subscribed keywords does."""
+    return _keywords_version
 
 async def add_subscription(user_id: int, keyword: str):
     """Adds a new keyword subscription for a user."""
     keyword = keyword.lower().strip()
     try:
-        async with aiosqlite.connect(DATABASE_PATH) as db:
-            await db.execute(
-                "INSERT INTO subscriptions (user_id, keyword) VALUES (?, ?)",
-                (user_id, keyword)
-            )
-            await db.commit()
+        await _write_subscription(
+            "INSERT INTO subscriptions (user_id, keyword) VALUES (?, ?)",
+            (user_id, keyword)
+        )
+        _index_subscription(user_id, keyword)
         logger.info(f"User {user_id} subscribed to '{keyword}'")
         return True
     except aiosqlite.IntegrityError:
@@ -48,59 +446,481 @@ async def add_subscription(user_id: int, keyword: str):
 async def remove_subscription(user_id: int, keyword: str):
     """Removes a keyword subscription for a user."""
     keyword = keyword.lower().strip()
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute(
-            "DELETE FROM subscriptions WHERE user_id = ? AND keyword = ?",
-            (user_id, keyword)
-        )
-        await db.commit()
-        if cursor.rowcount > 0:
-            logger.info(f"User {user_id} unsubscribed from '{keyword}'")
-            return True
-        logger.warning(f"User {user_id} tried to unsubscribe from a non-existent keyword '{keyword}'")
-        return False
+    rowcount = await _write_subscription(
+        "DELETE FROM subscriptions WHERE user_id = ? AND keyword = ?",
+        (user_id, keyword)
+    )
+    if rowcount > 0:
+        _unindex_subscription(user_id, keyword)
+        logger.info(f"User {user_id} unsubscribed from '{keyword}'")
+        return True
+    logger.warning(f"User {user_id} tried to unsubscribe from a non-existent keyword '{keyword}'")
+    return False
 
 async def get_subscriptions(user_id: int):
-    """Retrieves all keyword subscriptions for a user."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute("SELECT keyword FROM subscriptions WHERE user_id = ?", (user_id,))
-        rows = await cursor.fetchall()
-        return [row[0] for row in rows]
+    """Retrieves all keyword subscriptions for a user, in alphabetical order."""
+    await _sync_subscriptions()
+    return sorted(_user_keywords.get(user_id, ()))
 
 async def get_all_subscriptions():
-    """Retrieves all subscriptions grouped by keyword."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute("SELECT keyword, user_id FROM subscriptions")
-        rows = await cursor.fetchall()
-        subscriptions = {}
-        for keyword, user_id in rows:
-            if keyword not in subscriptions:
-                subscriptions[keyword] = []
-            subscriptions[keyword].append(user_id)
-        return subscriptions
+    """
+    Retrieves all subscriptions grouped by keyword.
+
+    Returns the live index rather than a copy, so callers must not modify it.
+    A keyword can disappear whenever the caller awaits, if its last subscriber leaves.
+    """
+    await _sync_subscriptions()
+    return _keyword_users
+
+# --- User Settings ---
+
+async def set_delivery_mode(user_id: int, mode: str):
+    """Stores whether a user gets instant alerts or a digest."""
+    await _execute_write(
+        "INSERT INTO user_settings (user_id, delivery_mode) VALUES (?, ?) "
+        "ON CONFLICT(user_id) DO UPDATE SET delivery_mode = excluded.delivery_mode",
+        (user_id, mode)
+    )
+    logger.info(f"User {user_id} switched delivery mode to '{mode}'")
+
+async def get_delivery_mode(user_id: int):
+    """Retrieves a user's delivery mode, or None if they never chose one."""
+    rows = await _fetchall("SELECT delivery_mode FROM user_settings WHERE user_id = ?", (user_id,))
+    return rows[0][0] if rows else None
+
+async def get_all_delivery_modes():
+    """Retrieves the delivery mode of every user who chose one, keyed by user ID."""
+    rows = await _fetchall("SELECT user_id, delivery_mode FROM user_settings")
+    return dict(rows)
+
+# --- Source High-Water Marks ---
+
+async def get_source_watermarks():
+    """Retrieves the newest job ID seen for every fetched URL, keyed by URL."""
+    rows = await _fetchall("SELECT url, watermark FROM source_watermarks")
+    return dict(rows)
+
+async def set_source_watermarks(watermarks: list[tuple[str, str, int]]):
+    """Stores (url, source, watermark) high-water marks, never moving one backwards."""
+    await _execute_write_many(
+        "INSERT INTO source_watermarks (url, source, watermark, updated_at) VALUES (?, ?, ?, strftime('%s', 'now')) "
+        "ON CONFLICT(url) DO UPDATE SET watermark = MAX(watermark, excluded.watermark), updated_at = excluded.updated_at",
+        watermarks
+    )
+
+# --- Posted Jobs ---
+
+def job_hash(job_id: str) -> int:
+    """Returns the signed 64-bit hash a job ID is stored as in compact dedup mode."""
+    return int.from_bytes(hashlib.blake2b(job_id.encode(), digest_size=8).digest(), "big", signed=True)
+
+def _dedup_key(job_id: str) -> str | int:
+    """Returns what identifies a job in the dedup table for the configured mode."""
+    return job_hash(job_id) if DEDUP_MODE == "hash" else job_id
+
+def _dedup_table() -> tuple[str, str]:
+    """Returns the dedup table and its key column for the configured mode."""
+    return ("job_hashes", "hash") if DEDUP_MODE == "hash" else ("jobs", "job_id")
 
 async def is_job_posted(job_id: str):
     """Checks if a job has already been posted by its unique ID."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute("SELECT 1 FROM jobs WHERE job_id = ?", (job_id,))
-        return await cursor.fetchone() is not None
+    key = _dedup_key(job_id)
+    if key in _posted_job_ids:
+        return True
+    table, column = _dedup_table()
+    if not await _fetchall(f"SELECT 1 FROM {table} WHERE {column} = ?", (key,)):
+        return False
+    _posted_job_ids.add(key)
+    return True
+
+async def filter_unposted_jobs(job_ids: list[str]):
+    """
+    Returns the job IDs that have not been posted yet, in their original order.
+
+    IDs already in the in-memory seen-set are dropped without touching SQLite;
+    the rest are checked with one query per chunk of IDs.
+    """
+    keys = {job_id: _dedup_key(job_id) for job_id in dict.fromkeys(job_ids)}
+    candidates = [job_id for job_id, key in keys.items() if key not in _posted_job_ids]
+    if not candidates:
+        return []
+
+    table, column = _dedup_table()
+    posted = set()
+    for start in range(0, len(candidates), _MAX_QUERY_PARAMS):
+        chunk = [keys[job_id] for job_id in candidates[start:start + _MAX_QUERY_PARAMS]]
+        placeholders = ",".join("?" * len(chunk))
+        rows = await _fetchall(f"SELECT {column} FROM {table} WHERE {column} IN ({placeholders})", chunk)
+        posted.update(row[0] for row in rows)
+
+    _posted_job_ids.update(posted)
+    return [job_id for job_id in candidates if keys[job_id] not in posted]
 
 async def add_posted_job(job_id: str, title: str, company: str, link: str, source: str):
     """Adds a record of a posted job to prevent duplicates."""
+    key = _dedup_key(job_id)
     try:
-        async with aiosqlite.connect(DATABASE_PATH) as db:
-            await db.execute(
-                "INSERT INTO jobs (job_id, title, company, link, source) VALUES (?, ?, ?, ?, ?)",
+        if DEDUP_MODE == "hash":
+            await _execute_write(
+                "INSERT INTO job_hashes (hash, first_seen) VALUES (?, strftime('%s', 'now'))", (key,)
+            )
+        else:
+            await _execute_write(
+                "INSERT INTO jobs (job_id, title, company, link, source, first_seen) "
+                "VALUES (?, ?, ?, ?, ?, strftime('%s', 'now'))",
                 (job_id, title, company, link, source)
             )
-            await db.commit()
     except aiosqlite.IntegrityError:
         logger.warning(f"Attempted to add a duplicate job with ID: {job_id}")
+    _posted_job_ids.add(key)
+
+async def add_posted_jobs(jobs: list[Job]):
+    """Records many posted jobs in a single transaction, ignoring ones already stored."""
+    if not jobs:
+        return
+    await _ensure_connected()
+    async with _write_lock:
+        with metrics.timer("db_query_seconds", op="write"):
+            keys = await _insert_posted_jobs(jobs)
+    await _commit()
+    _posted_job_ids.update(keys)
+
+async def _insert_posted_jobs(jobs: list[Job]) -> list[str | int]:
+    """Inserts posted jobs on the writer, which the caller holds the write lock of. Returns their dedup keys."""
+    keys = [_dedup_key(job.id) for job in jobs]
+    if DEDUP_MODE == "hash":
+        await _writer.executemany(
+            "INSERT OR IGNORE INTO job_hashes (hash, first_seen) VALUES (?, strftime('%s', 'now'))",
+            [(key,) for key in keys]
+        )
+    else:
+        await _writer.executemany(
+            "INSERT OR IGNORE INTO jobs (job_id, title, company, link, source, first_seen) "
+            "VALUES (?, ?, ?, ?, ?, strftime('%s', 'now'))",
+            [job.as_record() for job in jobs]
+        )
+    return keys
+
+async def prune_posted_jobs(retention_days: int = JOB_RETENTION_DAYS) -> int:
+    """
+    Forgets posted jobs first seen more than retention_days ago, then returns
+    freed pages to the OS with an incremental vacuum.
+
+    Both dedup tables are pruned, so rows left behind by a change of DEDUP_MODE
+    also age out.
+
+    Returns:
+        int: The number of rows deleted.
+    """
+    cutoff = int(time.time()) - retention_days * 86400
+    dedup_table = _dedup_table()
+    await _ensure_connected()
+
+    removed = 0
+    async with _write_lock:
+        for table, column in (("jobs", "job_id"), ("job_hashes", "hash")):
+            async with _writer.execute(f"SELECT {column} FROM {table} WHERE first_seen < ?", (cutoff,)) as cursor:
+                expired = [row[0] for row in await cursor.fetchall()]
+            if not expired:
+                continue
+            await _writer.execute(f"DELETE FROM {table} WHERE first_seen < ?", (cutoff,))
+            if (table, column) == dedup_table:
+                _posted_job_ids.difference_update(expired)
+            removed += len(expired)
+    await _commit()
+
+    async with _write_lock:
+        await _writer.executescript(f"PRAGMA incremental_vacuum({DB_VACUUM_PAGES});")
+    logger.info(f"Pruned {removed} posted jobs older than {retention_days} days.")
+    return removed
+
+# --- Job Search ---
+
+def _search_expression(query: str, title_only: bool = False) -> str | None:
+    """
+    Turns free text into an FTS5 query, so user input can't inject query syntax.
+
+    The words are matched as a phrase of whole words, so "data engineer" finds
+    "Senior Data Engineer" but "data eng" does not. Prefix queries would merge
+    every word sharing the prefix and are two orders of magnitude slower at a
+    million rows. Returns None if the text has no searchable words.
+    """
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return None
+    phrase = '"' + " ".join(words) + '"'
+    return f"title : {phrase}" if title_only else phrase
+
+async def search_jobs(query: str, limit: int = SEARCH_PAGE_SIZE, before: int | None = None,
+                      title_only: bool = False) -> tuple[list[Job], int | None]:
+    """
+    Finds posted jobs whose title or company matches the query, newest first.
+
+    Only jobs kept in the jobs table are searchable, so compact dedup mode
+    (DEDUP_MODE = "hash") has nothing to search.
+
+    Args:
+        query (str): The words to look for.
+        limit (int): The page size.
+        before (int): The cursor returned with the previous page, to get the next one.
+        title_only (bool): Match titles only, as subscriptions do.
+
+    Returns:
+        tuple: The page of jobs, and the cursor for the next page or None if this was the last.
+    """
+    expression = _search_expression(query, title_only)
+    if expression is None:
+        return [], None
+    # Let FTS5 walk its index newest first and stop after one page, then look the rows up
+    rows = await _fetchall(
+        "SELECT id, job_id, title, company, link, source FROM jobs WHERE id IN ("
+        "SELECT rowid FROM jobs_fts WHERE jobs_fts MATCH ? AND rowid < ? ORDER BY rowid DESC LIMIT ?"
+        ") ORDER BY id DESC",
+        (expression, before if before is not None else 2 ** 63 - 1, limit + 1)
+    )
+    jobs = [Job(*row[1:]) for row in rows[:limit]]
+    return jobs, rows[limit - 1][0] if len(rows) > limit else None
+
+# --- Run Journal & Outbox ---
+
+RUN_RUNNING = "running"
+RUN_FINISHED = "finished"
+RUN_INTERRUPTED = "interrupted"  # Cut short by a crash or restart, and finished from the outbox on the next start
+
+async def start_run(source: str | None = None) -> int:
+    """Opens a journal entry for a job run over one source (or all of them) and returns its ID."""
+    await _ensure_connected()
+    async with _write_lock:
+        with metrics.timer("db_query_seconds", op="write"):
+            async with _writer.execute(
+                "INSERT INTO runs (source, status, started_at) VALUES (?, ?, ?)", (source, RUN_RUNNING, time.time())
+            ) as cursor:
+                run_id = cursor.lastrowid
+    await _commit()
+    return run_id
+
+async def record_matches(run_id: int, jobs: list[Job], alerts: list[tuple[int, Job, list[str], bool]]) -> list[int]:
+    """
+    Marks newly found jobs as posted and writes the alerts matched on them to
+    the run's outbox, in one transaction.
+
+    Either both are stored or neither is, so a crash can't leave jobs recorded
+    whose alerts were never sent, or alerts sent for jobs that will be matched
+    again.
+
+    Args:
+        run_id (int): The run from start_run().
+        jobs (list): The new jobs to record as posted.
+        alerts (list): (user_id, job, matched keywords, digest) tuples, where
+            digest is true for alerts held back for the run's digest.
+
+    Returns:
+        list: The outbox ID of each alert, in order, for mark_delivered().
+    """
+    if not jobs:
+        return []
+    records = {}
+    rows = []
+    for user_id, job, keywords, digest in alerts:
+        if job.id not in records:
+            records[job.id] = json.dumps(job.as_record())
+        rows.append((run_id, user_id, records[job.id], json.dumps(keywords), int(digest)))
+
+    await _ensure_connected()
+    async with _write_lock:
+        with metrics.timer("db_query_seconds", op="write"):
+            keys = await _insert_posted_jobs(jobs)
+            await _writer.executemany(
+                "INSERT INTO outbox (run_id, user_id, job, keywords, digest) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            # Only this connection writes to the run, and the transaction is still open
+            async with _writer.execute(
+                "SELECT id FROM outbox WHERE run_id = ? ORDER BY id DESC LIMIT ?", (run_id, len(rows))
+            ) as cursor:
+                outbox_ids = [row[0] for row in await cursor.fetchall()]
+    await _commit()
+    _posted_job_ids.update(keys)
+    outbox_ids.reverse()
+    return outbox_ids
+
+async def get_undelivered_alerts(run_id: int, digest_only: bool = False) -> list[tuple[int, int, Job, list[str], bool]]:
+    """
+    Returns a run's alerts that haven't gone out yet, oldest first.
+
+    Returns:
+        list: (outbox_id, user_id, job, matched keywords, digest) tuples.
+    """
+    rows = await _fetchall(
+        "SELECT id, user_id, job, keywords, digest FROM outbox WHERE run_id = ? AND delivered_at IS NULL"
+        + (" AND digest = 1" if digest_only else "") + " ORDER BY id",
+        (run_id,)
+    )
+    return [
+        (outbox_id, user_id, Job(*json.loads(job)), json.loads(keywords), bool(digest))
+        for outbox_id, user_id, job, keywords, digest in rows
+    ]
+
+async def mark_delivered(outbox_ids: list[int]):
+    """Marks alerts as delivered, once they were sent or given up on."""
+    if outbox_ids:
+        await _execute_write_many(
+            "UPDATE outbox SET delivered_at = ? WHERE id = ?", [(time.time(), outbox_id) for outbox_id in outbox_ids]
+        )
+
+async def finish_run(run_id: int, status: str = RUN_FINISHED, jobs_scraped: int = 0, jobs_new: int = 0, alerts: int = 0):
+    """Closes a run's journal entry once all its alerts have been handed to the dispatcher."""
+    await _execute_write(
+        "UPDATE runs SET status = ?, finished_at = ?, jobs_scraped = jobs_scraped + ?, jobs_new = jobs_new + ?, "
+        "alerts = alerts + ? WHERE id = ?",
+        (status, time.time(), jobs_scraped, jobs_new, alerts, run_id)
+    )
+
+async def get_unfinished_runs() -> list[int]:
+    """
+    Returns the runs a previous process left behind: ones that never finished,
+    and finished ones with alerts still undelivered when it stopped.
+    """
+    rows = await _fetchall(
+        "SELECT id FROM runs WHERE status = ? "
+        "UNION SELECT DISTINCT run_id FROM outbox WHERE delivered_at IS NULL ORDER BY 1",
+        (RUN_RUNNING,)
+    )
+    return [row[0] for row in rows]
+
+async def prune_runs(retention_days: int = RUN_JOURNAL_RETENTION_DAYS) -> int:
+    """Forgets runs that finished more than retention_days ago, along with their delivered alerts."""
+    cutoff = time.time() - retention_days * 86400
+    await _execute_write(
+        "DELETE FROM outbox WHERE delivered_at IS NOT NULL AND run_id IN (SELECT id FROM runs WHERE finished_at < ?)",
+        (cutoff,)
+    )
+    removed = await _execute_write(
+        "DELETE FROM runs WHERE finished_at < ? AND NOT EXISTS (SELECT 1 FROM outbox WHERE outbox.run_id = runs.id)",
+        (cutoff,)
+    )
+    if removed:
+        logger.info(f"Pruned {removed} runs finished over {retention_days} days ago from the journal.")
+    return removed
+
+# --- Work Queue ---
+
+async def enqueue_tasks(queue: str, payloads: list, dedup_keys: list[str] | None = None) -> int:
+    """
+    Adds tasks to a work queue. A task whose dedup key is already waiting in
+    the same queue is skipped, so a URL is never queued twice; one that ran out
+    of attempts is given a fresh start instead.
+
+    Args:
+        queue (str): The queue name, e.g. "scrape".
+        payloads (list): JSON-serializable task bodies.
+        dedup_keys (list): Optional key per payload.
+
+    Returns:
+        int: The number of tasks added or restarted.
+    """
+    if not payloads:
+        return 0
+    if dedup_keys is None:
+        dedup_keys = [None] * len(payloads)
+    now = time.time()
+    await _ensure_connected()
+    async with _write_lock:
+        with metrics.timer("db_query_seconds", op="write"):
+            before = _writer.total_changes
+            await _writer.executemany(
+                "INSERT INTO work_queue (queue, payload, dedup_key, available_at, created_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(queue, dedup_key) DO UPDATE SET payload = excluded.payload, attempts = 0, "
+                "available_at = excluded.available_at, lease_token = NULL WHERE work_queue.attempts >= ?",
+                [(queue, json.dumps(payload), key, now, now, WORK_MAX_ATTEMPTS) for payload, key in zip(payloads, dedup_keys)]
+            )
+            added = _writer.total_changes - before
+    await _commit()
+    return added
+
+async def claim_tasks(queue: str, limit: int, visibility_timeout: float = WORK_VISIBILITY_TIMEOUT) -> list[tuple]:
+    """
+    Leases up to limit available tasks from a queue.
+
+    Claimed tasks stay invisible to other workers for visibility_timeout seconds.
+    Finish them with complete_task(), or they become available again once the
+    lease runs out. Tasks claimed WORK_MAX_ATTEMPTS times are left in the queue
+    for inspection and never handed out again.
+
+    Returns:
+        list: (task_id, lease_token, payload, attempts) tuples, oldest first.
+    """
+    token = uuid.uuid4().hex
+    now = time.time()
+    await _ensure_connected()
+    async with _write_lock:
+        with metrics.timer("db_query_seconds", op="write"):
+            # The UPDATE takes SQLite's write lock, so no other process can claim the same rows
+            await _writer.execute(
+                "UPDATE work_queue SET lease_token = ?, available_at = ?, attempts = attempts + 1 "
+                "WHERE id IN (SELECT id FROM work_queue WHERE queue = ? AND available_at <= ? AND attempts < ? "
+                "ORDER BY id LIMIT ?)",
+                (token, now + visibility_timeout, queue, now, WORK_MAX_ATTEMPTS, limit)
+            )
+            async with _writer.execute(
+                "SELECT id, payload, attempts FROM work_queue WHERE lease_token = ? ORDER BY id", (token,)
+            ) as cursor:
+                rows = await cursor.fetchall()
+    await _commit()
+    return [(task_id, token, json.loads(payload), attempts) for task_id, payload, attempts in rows]
+
+async def complete_task(task_id: int, lease_token: str) -> bool:
+    """Removes a finished task. Returns False if its lease had expired and another worker took it over."""
+    rowcount = await _execute_write(
+        "DELETE FROM work_queue WHERE id = ? AND lease_token = ?", (task_id, lease_token)
+    )
+    return rowcount > 0
+
+async def extend_leases(leases: list[tuple[int, str]], visibility_timeout: float = WORK_VISIBILITY_TIMEOUT):
+    """Keeps claimed tasks hidden for another visibility_timeout seconds, given (task_id, lease_token) pairs."""
+    if not leases:
+        return
+    available_at = time.time() + visibility_timeout
+    await _execute_write_many(
+        "UPDATE work_queue SET available_at = ? WHERE id = ? AND lease_token = ?",
+        [(available_at, task_id, token) for task_id, token in leases]
+    )
+
+async def release_task(task_id: int, lease_token: str, delay: float = 0.0):
+    """Hands a task back to the queue after a failure, to be retried in delay seconds."""
+    await _execute_write(
+        "UPDATE work_queue SET lease_token = NULL, available_at = ? WHERE id = ? AND lease_token = ?",
+        (time.time() + delay, task_id, lease_token)
+    )
+
+async def count_tasks(queue: str) -> int:
+    """Returns how many tasks are waiting in or leased from a queue, excluding ones out of attempts."""
+    rows = await _fetchall(
+        "SELECT COUNT(*) FROM work_queue WHERE queue = ? AND attempts < ?", (queue, WORK_MAX_ATTEMPTS)
+    )
+    return rows[0][0]
+
+async def acquire_leader(name: str, owner: str, ttl: float) -> bool:
+    """
+    Takes or renews the named leader lock for ttl seconds.
+
+    Succeeds if the lock is free, expired, or already held by owner, so the
+    holder keeps it by calling this again before ttl runs out.
+    """
+    now = time.time()
+    rowcount = await _execute_write(
+        "INSERT INTO leader_locks (name, owner, expires_at) VALUES (?, ?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+        "WHERE leader_locks.owner = excluded.owner OR leader_locks.expires_at < ?",
+        (name, owner, now + ttl, now)
+    )
+    return rowcount > 0
+
+async def release_leader(name: str, owner: str):
+    """Gives up the named leader lock if owner holds it, so a standby can take over at once."""
+    await _execute_write("DELETE FROM leader_locks WHERE name = ? AND owner = ?", (name, owner))
 
 
 async def get_all_unique_keywords():
-    """Retrieves a list of all unique keywords from the subscriptions table."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute("SELECT DISTINCT keyword FROM subscriptions")
-        rows = await cursor.fetchall()
-        return [row[0] for row in rows]
\ No newline at end of file
+    """Retrieves a list of all unique subscribed keywords."""
+    await _sync_subscriptions()
+    return list(_keyword_users)
@@ -1,20 +1,27 @@
 from aiogram import Router, F
-from aiogram.types import Message
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import CommandStart, Command
 import database as db
+from alerts import DELIVERY_MODES, escape_markdown, format_search_results
+from config import DEFAULT_DELIVERY_MODE, SUBSCRIBE_BACKFILL
 
 router = Router()
 
+# Telegram's limit on a button's callback data, in bytes
+CALLBACK_DATA_LIMIT = 64
+
 # --- Welcome and Help Messages ---
 WELCOME_MESSAGE = """
 👋 Welcome to the Job Alert Bot!
 
-I will help you find remote jobs by scraping popular job boards daily.
+I will help you find remote jobs by scraping popular job boards throughout the day.
 
 **Available Commands:**
 /subscribe <keyword> - Add a job filter (e.g., /subscribe Python)
 /unsubscribe <keyword> - Remove a job filter
 /list - Show your current subscriptions
+/mode <instant|digest> - Choose one alert per job or a grouped digest
+/search <words> - Look up jobs the bot has already found
 /help - Display this help message
 
 Start by subscribing to a keyword you're interested in!
@@ -35,9 +42,44 @@ HELP_MESSAGE = """
    Use the `/unsubscribe` command followed by the keyword you want to remove.
    *Example:* `/unsubscribe react`
 
-The bot will automatically scan for new jobs once a day and send you a notification if a job title matches one of your keywords.
+4️⃣ **Choose How Alerts Arrive:**
+   Use `/mode digest` to get all new matches grouped into a few digest messages, or `/mode instant` to get one message per job.
+   Send `/mode` on its own to see your current setting.
+
+5️⃣ **Search Past Jobs:**
+   Use `/search` followed by a few words to look through jobs the bot has already found, newest first.
+   *Example:* `/search python django`
+   New subscriptions also show the most recent jobs matching the keyword right away.
+
+The bot will automatically scan for new jobs throughout the day and send you a notification if a job title matches one of your keywords.
 """
 
+# --- Search Results ---
+
+def _next_page_keyboard(query: str, title_only: bool, cursor: int | None) -> InlineKeyboardMarkup | None:
+    """Returns a "Next page" button for a search, or None on the last page."""
+    if cursor is None:
+        return None
+    data = f"search:{'t' if title_only else 'a'}:{cursor}:{query}"
+    if len(data.encode()) > CALLBACK_DATA_LIMIT:
+        # The query doesn't fit in the button; the first page will have to do
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="Next page ▶", callback_data=data)]])
+
+async def _send_search_page(message: Message, header: str, query: str, title_only: bool = False,
+                            before: int | None = None) -> bool:
+    """Sends one page of search results. Returns False if nothing matched."""
+    jobs, cursor = await db.search_jobs(query, before=before, title_only=title_only)
+    if not jobs:
+        return False
+    await message.answer(
+        format_search_results(header, jobs),
+        parse_mode="Markdown",
+        disable_web_page_preview=True,
+        reply_markup=_next_page_keyboard(query, title_only, cursor),
+    )
+    return True
+
 # --- Command Handlers ---
 
 @router.message(CommandStart())
@@ -61,9 +103,12 @@ async def handle_subscribe(message: Message):
     keyword = keyword[0]
     success = await db.add_subscription(message.from_user.id, keyword)
     if success:
-        await message.answer(f"✅ You have successfully subscribed to job alerts for: **{keyword}**", parse_mode="Markdown")
+        await message.answer(f"✅ You have successfully subscribed to job alerts for: **{escape_markdown(keyword)}**", parse_mode="Markdown")
+        if SUBSCRIBE_BACKFILL:
+            # Matched on titles only, like the alerts themselves
+            await _send_search_page(message, f"🕘 **Recent jobs matching {escape_markdown(keyword)}:**\n\n", keyword, title_only=True)
     else:
-        await message.answer(f"🤔 You are already subscribed to **{keyword}**.", parse_mode="Markdown")
+        await message.answer(f"🤔 You are already subscribed to **{escape_markdown(keyword)}**.", parse_mode="Markdown")
 
 @router.message(Command("unsubscribe"))
 async def handle_unsubscribe(message: Message):
@@ -76,9 +121,9 @@ async def handle_unsubscribe(message: Message):
     keyword = keyword[0]
     success = await db.remove_subscription(message.from_user.id, keyword)
     if success:
-        await message.answer(f"🗑️ You have successfully unsubscribed from: **{keyword}**", parse_mode="Markdown")
+        await message.answer(f"🗑️ You have successfully unsubscribed from: **{escape_markdown(keyword)}**", parse_mode="Markdown")
     else:
-        await message.answer(f"❌ You were not subscribed to **{keyword}**.", parse_mode="Markdown")
+        await message.answer(f"❌ You were not subscribed to **{escape_markdown(keyword)}**.", parse_mode="Markdown")
 
 @router.message(Command("list"))
 async def handle_list(message: Message):
@@ -91,4 +136,53 @@ async def handle_list(message: Message):
     # Format the list for better readability
     sub_list = "\n".join([f"- `{sub}`" for sub in subscriptions])
     response_text = f"**Your current subscriptions:**\n{sub_list}"
-    await message.answer(response_text, parse_mode="Markdown")
\ No newline at end of file
+    await message.answer(response_text, parse_mode="Markdown")
+
+@router.message(Command("mode"))
+async def handle_mode(message: Message):
+    """Handler for the /mode [instant|digest] command."""
+    mode = message.text.split(maxsplit=1)[1:]
+    if not mode:
+        current = await db.get_delivery_mode(message.from_user.id) or DEFAULT_DELIVERY_MODE
+        await message.answer(f"Your alerts are delivered in **{current}** mode. Usage: `/mode <instant|digest>`", parse_mode="Markdown")
+        return
+
+    mode = mode[0].lower().strip()
+    if mode not in DELIVERY_MODES:
+        await message.answer("Please choose either `instant` or `digest`. Usage: `/mode <instant|digest>`", parse_mode="Markdown")
+        return
+
+    await db.set_delivery_mode(message.from_user.id, mode)
+    await message.answer(f"✅ Your alerts will now be delivered in **{mode}** mode.", parse_mode="Markdown")
+
+@router.message(Command("search"))
+async def handle_search(message: Message):
+    """Handler for the /search <words> command."""
+    query = message.text.split(maxsplit=1)[1:]
+    if not query:
+        await message.answer("Please provide something to search for. Usage: `/search <words>`", parse_mode="Markdown")
+        return
+
+    query = query[0].strip()
+    if not await _send_search_page(message, f"🔎 **Jobs matching {escape_markdown(query)}:**\n\n", query):
+        await message.answer(f"No jobs found for **{escape_markdown(query)}** yet.", parse_mode="Markdown")
+
+@router.callback_query(F.data.startswith("search:"))
+async def handle_search_page(callback: CallbackQuery):
+    """Handler for the "Next page" button under search results."""
+    try:
+        _, scope, cursor, query = callback.data.split(":", 3)
+        cursor = int(cursor)
+    except ValueError:
+        # Not a button we made, or one from an older version of the bot
+        await callback.answer("This button has expired. Please search again.")
+        return
+    await callback.answer()
+    if callback.message is None:
+        return
+    # Only the newest page keeps the button
+    await callback.message.edit_reply_markup(reply_markup=None)
+    if not await _send_search_page(
+        callback.message, f"🔎 **More jobs matching {escape_markdown(query)}:**\n\n", query, title_only=scope == "t", before=cursor
+    ):
+        await callback.message.answer("No more results.")
@@ -0,0 +1,35 @@
+# job_alert_bot/jobs.py
+
+import sys
+from dataclasses import dataclass
+
+# Field order of the compact records jobs are passed around as between processes
+JOB_FIELDS = ("id", "title", "company", "link", "source")
+
+
+def _intern(value: str | None) -> str | None:
+    return sys.intern(value) if type(value) is str else value
+
+
+@dataclass(frozen=True, slots=True)
+class Job:
+    """
+    A scraped job posting, as emitted by scrapers and matched, recorded and sent by the bot.
+
+    Slotted and immutable, so a large run holds a fraction of the memory a dict
+    per job would. Sources and company names repeat across thousands of
+    postings, so they are interned and every job shares one copy of each.
+    """
+    id: str
+    title: str
+    company: str | None
+    link: str
+    source: str
+
+    def __post_init__(self):
+        object.__setattr__(self, "company", _intern(self.company))
+        object.__setattr__(self, "source", _intern(self.source))
+
+    def as_record(self) -> tuple:
+        """Returns the job as a plain tuple in JOB_FIELDS order; Job(*record) turns it back."""
+        return (self.id, self.title, self.company, self.link, self.source)
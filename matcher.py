@@ -0,0 +1,89 @@
+from collections import deque
+
+
+class KeywordMatcher:
+    """
+    Finds every subscribed keyword contained in a job title in a single pass.
+
+    Builds an Aho-Corasick automaton over the lowercased keywords, so matching
+    a title costs O(len(title) + matches) instead of one substring test per
+    keyword. Results are identical to `keyword.lower() in title.lower()`.
+    """
+
+    def __init__(self, keywords):
+        """
+        Args:
+            keywords (iterable): The keywords to match, e.g. the keys of db.get_all_subscriptions().
+        """
+        self.keywords = list(dict.fromkeys(keywords))
+
+        # State 0 is the root. _goto[state] maps a character to the next state,
+        # _fail[state] is the longest proper suffix that is also a trie path and
+        # _output[state] holds the indexes of every keyword ending at that state.
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        # The empty string is a substring of every title
+        self._always = tuple(i for i, keyword in enumerate(self.keywords) if not keyword)
+
+        for index, keyword in enumerate(self.keywords):
+            if keyword:
+                self._add(keyword.lower(), index)
+        self._build_failure_links()
+
+    def _add(self, pattern: str, index: int):
+        """Inserts a pattern into the trie."""
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] += (index,)
+
+    def _build_failure_links(self):
+        """Computes failure links breadth-first and merges suffix outputs into each state."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                # Parents are processed first, so the fail state's output is already complete
+                self._output[next_state] += self._output[fail]
+
+    def match(self, title: str) -> list[str]:
+        """
+        Returns every keyword contained in the title.
+
+        Args:
+            title (str): The job title to search.
+
+        Returns:
+            list: The matching keywords, in the order they were given.
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        found = set(self._always)
+
+        state = 0
+        for char in title.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+
+        return [self.keywords[index] for index in sorted(found)]
+
+    def __len__(self):
+        return len(self.keywords)
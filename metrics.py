@@ -0,0 +1,194 @@
+# job_alert_bot/metrics.py
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from aiohttp import web
+from config import METRICS_HOST, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, suited to everything from a DB query to a slow page fetch
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# name -> (type, help text, histogram buckets)
+_definitions: dict[str, tuple[str, str, tuple]] = {}
+# name -> {sorted label pairs -> value}; histograms store [bucket counts..., sum, count]
+_values: dict[str, dict[tuple, float | list]] = {}
+# Counter and histogram totals of the run executing in the current context, see run_counters()
+_run_counters: ContextVar[dict[str, float] | None] = ContextVar("run_counters", default=None)
+
+
+def _define(name: str, kind: str, help_text: str, buckets: tuple = ()):
+    _definitions[name] = (kind, help_text, buckets)
+    _values[name] = {}
+
+
+# --- Metric Definitions ---
+_define("scraper_fetch_seconds", "histogram", "Time spent on HTTP requests to job boards.", DEFAULT_BUCKETS)
+_define("scraper_responses_total", "counter", "HTTP responses from job boards by status code.")
+_define("scraper_fetch_errors_total", "counter", "Requests to job boards that failed without a response.")
+_define("scraper_bytes_downloaded_total", "counter", "Response body bytes downloaded from job boards.")
+_define("scraper_not_modified_total", "counter", "Fetches skipped because the content had not changed.")
+_define("scraper_retries_total", "counter", "Requests to job boards retried after a 429, 5xx or network error.")
+_define("scraper_hedged_requests_total", "counter", "Backup requests sent because the first was slower than usual.")
+_define("scraper_circuit_open", "gauge", "Whether requests to a host are being skipped after repeated failures.")
+_define("scraper_short_circuited_total", "counter", "Fetches skipped because the host's circuit was open.")
+_define("scraper_parse_seconds", "histogram", "Time spent parsing and extracting jobs from a response.", DEFAULT_BUCKETS)
+_define("scraper_jobs_scraped_total", "counter", "Jobs extracted from job boards.")
+_define("pipeline_jobs_deduplicated_total", "counter", "Scraped jobs dropped because they were already posted.")
+_define("pipeline_jobs_new_total", "counter", "Scraped jobs that had not been posted before.")
+_define("pipeline_match_seconds", "histogram", "Time spent matching a run's jobs and queueing alerts.", DEFAULT_BUCKETS)
+_define("notifier_send_seconds", "histogram", "Latency of Telegram sendMessage calls.", DEFAULT_BUCKETS)
+_define("notifier_messages_total", "counter", "Messages handled by the dispatcher by outcome.")
+_define("notifier_rate_limited_total", "counter", "Telegram 429 Too Many Requests answers.")
+_define("notifier_queue_size", "gauge", "Messages waiting in the dispatcher queue.")
+_define("db_query_seconds", "histogram", "Time spent on SQLite statements and commits.", DEFAULT_BUCKETS)
+
+
+# --- Recording ---
+
+def inc(name: str, value: float = 1, **labels):
+    """Adds to a counter."""
+    key = tuple(sorted(labels.items()))
+    series = _values[name]
+    series[key] = series.get(key, 0) + value
+    counters = _run_counters.get()
+    if counters is not None:
+        counters[name] = counters.get(name, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels):
+    """Sets a gauge to its current value."""
+    _values[name][tuple(sorted(labels.items()))] = value
+
+
+def observe(name: str, value: float, **labels):
+    """Records one observation in a histogram."""
+    buckets = _definitions[name][2]
+    key = tuple(sorted(labels.items()))
+    series = _values[name]
+    state = series.get(key)
+    if state is None:
+        state = series[key] = [0] * len(buckets) + [0.0, 0]
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            state[index] += 1
+    state[-2] += value
+    state[-1] += 1
+    counters = _run_counters.get()
+    if counters is not None:
+        counters[f"{name}_sum"] = counters.get(f"{name}_sum", 0.0) + value
+        counters[f"{name}_count"] = counters.get(f"{name}_count", 0) + 1
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Observes how long the block took in a histogram, even if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+# --- Exposition ---
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def render() -> str:
+    """Returns every metric in the Prometheus text exposition format."""
+    lines = []
+    for name, (kind, help_text, buckets) in _definitions.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in _values[name].items():
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            for bound, count in zip(buckets, value):
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', bound),))} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {value[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def totals() -> dict[str, float]:
+    """Returns each counter summed over its labels, and each histogram's total time and count."""
+    result = {}
+    for name, (kind, _, _) in _definitions.items():
+        series = _values[name].values()
+        if kind == "counter":
+            result[name] = sum(series)
+        elif kind == "histogram":
+            result[f"{name}_sum"] = sum(state[-2] for state in series)
+            result[f"{name}_count"] = sum(state[-1] for state in series)
+    return result
+
+
+@contextmanager
+def run_counters():
+    """
+    Collects what every counter and histogram records inside the block, and in
+    the tasks it starts, into the dict it yields. Each run gets its own, so
+    runs of different sources that overlap don't count each other's work.
+    """
+    with recording_into({}) as counters:
+        yield counters
+
+
+def current_run_counters() -> dict[str, float] | None:
+    """Returns the counters of the run executing in the current context, if any."""
+    return _run_counters.get()
+
+
+@contextmanager
+def recording_into(counters: dict[str, float] | None):
+    """
+    Counts what is recorded inside the block for the run that owns counters, e.g.
+    work a long-lived task does on a run's behalf. None counts it for no run.
+    """
+    token = _run_counters.set(counters)
+    try:
+        yield counters
+    finally:
+        _run_counters.reset(token)
+
+
+def log_run_summary(counters: dict[str, float], **fields):
+    """
+    Logs one JSON record describing a run.
+
+    The record holds the given fields plus the run's own counters from
+    run_counters(), so the slow stage of a run can be read off a single log line.
+    """
+    record = {"event": "run_summary", **fields}
+    for name, value in counters.items():
+        if value:
+            record[name] = round(value, 4) if isinstance(value, float) else value
+    logger.info(json.dumps(record, sort_keys=True))
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """Serves the metrics for a Prometheus scraper."""
+    return web.Response(body=render().encode(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+async def start_metrics_server(port: int = METRICS_PORT) -> web.AppRunner:
+    """Serves /metrics on its own port, for when no webhook server is running. Returns the runner to clean up."""
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, METRICS_HOST, port).start()
+    logger.info(f"Metrics available on {METRICS_HOST}:{port}/metrics")
+    return runner
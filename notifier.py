@@ -0,0 +1,289 @@
+# job_alert_bot/notifier.py
+
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+import metrics
+from config import (
+    NOTIFY_WORKERS, NOTIFY_BURST, NOTIFY_GLOBAL_RATE, NOTIFY_PER_CHAT_INTERVAL, NOTIFY_MAX_RETRIES,
+    NOTIFY_QUEUE_SIZE, NOTIFY_STATS_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Notification:
+    """A single message waiting to be delivered."""
+    chat_id: int
+    text: str
+    attempts: int = 0
+    # Cleared when Telegram can't parse the Markdown, so the text is resent as is
+    markdown: bool = True
+    # Called once the message is sent or dropped
+    on_done: Callable[[], None] | None = None
+    # The counters of the run that queued the message, so its sends count towards that run
+    counters: dict[str, float] | None = None
+
+
+class TokenBucket:
+    """Limits how many messages per second leave the bot across all workers."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Stops handing out tokens for a while, e.g. after Telegram asks us to back off."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        """Waits until a token is available and takes it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+                await asyncio.sleep(wait)
+
+
+class NotificationDispatcher:
+    """
+    Delivers alerts from a queue through a pool of sender workers.
+
+    Sends are capped globally by a token bucket and spaced out per chat.
+    A pacer task moves queued messages to the workers as soon as their chat
+    may receive another one; messages for a chat that has to wait are parked
+    in a per-chat deque, so a user with a burst of alerts never ties up the
+    workers while everyone else's messages wait behind it. When Telegram
+    answers with RetryAfter the message is put back on the queue once the
+    requested delay has passed.
+    """
+
+    def __init__(self, bot: Bot, workers: int = NOTIFY_WORKERS, rate: float = NOTIFY_GLOBAL_RATE,
+                 per_chat_interval: float = NOTIFY_PER_CHAT_INTERVAL, max_retries: int = NOTIFY_MAX_RETRIES,
+                 queue_size: int = NOTIFY_QUEUE_SIZE, burst: float = NOTIFY_BURST):
+        self.bot = bot
+        self.workers = workers
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self._bucket = TokenBucket(rate, capacity=burst)
+        # Incoming messages, read by the pacer; join() waits on its unfinished count
+        self._queue: asyncio.Queue = asyncio.Queue()
+        # Messages whose chat is ready, read by the workers
+        self._ready: asyncio.Queue = asyncio.Queue()
+        # Bounds the messages held anywhere in the dispatcher, so enqueue() waits when it is full
+        self._capacity = asyncio.Semaphore(queue_size)
+        self._pending = 0
+        # Earliest time the next message may go to each chat
+        self._chat_next_slot: dict[int, float] = {}
+        # Messages waiting for their chat's next slot, and a heap of (slot, chat_id) for those chats
+        self._parked: dict[int, deque[Notification]] = {}
+        self._due: list[tuple[float, int]] = []
+        self._tasks: list[asyncio.Task] = []
+        # Delayed re-enqueues, referenced here so they aren't garbage collected
+        self._retries: set[asyncio.Task] = set()
+        self._started_at = None
+        self.stats = {"queued": 0, "sent": 0, "retried": 0, "rate_limited": 0, "dropped": 0}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        """Starts the sender workers and the periodic stats reporter."""
+        if self.running:
+            return
+        self._started_at = time.monotonic()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._pace()))
+        self._tasks.append(asyncio.create_task(self._report_stats()))
+        logger.info(f"Notification dispatcher started with {self.workers} workers.")
+
+    async def stop(self):
+        """Cancels the workers. Messages still in the queue are not delivered."""
+        tasks = self._tasks + list(self._retries)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self.log_stats()
+
+    async def enqueue(self, chat_id: int, text: str, on_done: Callable[[], None] | None = None):
+        """
+        Queues a message for delivery, waiting if the queue is full.
+
+        on_done is called once the message has been sent or dropped, but not when
+        the dispatcher is stopped before getting to it.
+        """
+        await self._capacity.acquire()
+        self._queue.put_nowait(Notification(chat_id, text, on_done=on_done, counters=metrics.current_run_counters()))
+        self._pending += 1
+        self.stats["queued"] += 1
+        metrics.set_gauge("notifier_queue_size", self._pending)
+
+    async def join(self):
+        """Waits until every queued message has been delivered or dropped."""
+        await self._queue.join()
+
+    def throughput(self) -> float:
+        """Returns messages sent per second since the dispatcher started."""
+        if self._started_at is None:
+            return 0.0
+        elapsed = time.monotonic() - self._started_at
+        return self.stats["sent"] / elapsed if elapsed > 0 else 0.0
+
+    def log_stats(self):
+        s = self.stats
+        logger.info(
+            f"Dispatcher: {s['sent']} sent, {s['dropped']} dropped, {s['retried']} retried, "
+            f"{s['rate_limited']} rate limited, {self._pending} pending, {self.throughput():.1f} msg/s."
+        )
+
+    async def _report_stats(self):
+        last_sent = -1
+        while True:
+            await asyncio.sleep(NOTIFY_STATS_INTERVAL)
+            # Forget chats whose next slot has already passed
+            now = time.monotonic()
+            self._chat_next_slot = {chat: slot for chat, slot in self._chat_next_slot.items() if slot > now}
+            if self.stats["sent"] != last_sent or self._pending:
+                last_sent = self.stats["sent"]
+                self.log_stats()
+
+    def _admit(self, notification: Notification):
+        """Hands a message to the workers if its chat is ready, or parks it until it is."""
+        chat_id = notification.chat_id
+        parked = self._parked.get(chat_id)
+        if parked is not None:
+            # Earlier messages to this chat are still waiting; keep them in order
+            parked.append(notification)
+            return
+        now = time.monotonic()
+        slot = self._chat_next_slot.get(chat_id, 0.0)
+        if slot <= now:
+            self._chat_next_slot[chat_id] = now + self.per_chat_interval
+            self._ready.put_nowait(notification)
+        else:
+            self._parked[chat_id] = deque([notification])
+            heapq.heappush(self._due, (slot, chat_id))
+
+    def _release_due(self):
+        """Hands the workers the next parked message of every chat whose slot has arrived."""
+        now = time.monotonic()
+        while self._due and self._due[0][0] <= now:
+            slot, chat_id = heapq.heappop(self._due)
+            parked = self._parked[chat_id]
+            self._ready.put_nowait(parked.popleft())
+            self._chat_next_slot[chat_id] = slot + self.per_chat_interval
+            if parked:
+                heapq.heappush(self._due, (slot + self.per_chat_interval, chat_id))
+            else:
+                del self._parked[chat_id]
+
+    async def _pace(self):
+        """Moves queued messages to the workers, holding each chat's back until its next slot."""
+        while True:
+            self._release_due()
+            if self._due:
+                try:
+                    notification = await asyncio.wait_for(self._queue.get(), self._due[0][0] - time.monotonic())
+                except asyncio.TimeoutError:
+                    continue
+            else:
+                notification = await self._queue.get()
+            self._admit(notification)
+
+    def _finish(self, notification: Notification, cancelled: bool):
+        """Frees a message's place in the dispatcher once it is sent, dropped or abandoned."""
+        self._queue.task_done()
+        self._capacity.release()
+        self._pending -= 1
+        if notification.on_done is not None and not cancelled:
+            notification.on_done()
+        metrics.set_gauge("notifier_queue_size", self._pending)
+
+    async def _requeue(self, notification: Notification, delay: float):
+        """Puts a message back on the queue after a delay."""
+        try:
+            await asyncio.sleep(delay)
+            self._queue.put_nowait(notification)
+        finally:
+            # The original entry only counts as done once its retry is queued,
+            # so join() keeps waiting for it
+            self._queue.task_done()
+
+    def _schedule_retry(self, notification: Notification, delay: float):
+        task = asyncio.create_task(self._requeue(notification, delay))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _worker(self, number: int):
+        while True:
+            notification = await self._ready.get()
+            with metrics.recording_into(notification.counters):
+                requeued = cancelled = False
+                try:
+                    await self._bucket.acquire()
+                    with metrics.timer("notifier_send_seconds"):
+                        await self.bot.send_message(
+                            notification.chat_id, notification.text,
+                            parse_mode="Markdown" if notification.markdown else None, disable_web_page_preview=True
+                        )
+                    self.stats["sent"] += 1
+                    metrics.inc("notifier_messages_total", outcome="sent")
+                except TelegramRetryAfter as e:
+                    self.stats["rate_limited"] += 1
+                    metrics.inc("notifier_rate_limited_total")
+                    self._bucket.pause(e.retry_after)
+                    logger.warning(f"Rate limited sending to {notification.chat_id}, retrying in {e.retry_after}s.")
+                    requeued = True
+                    self._schedule_retry(notification, e.retry_after)
+                except TelegramBadRequest as e:
+                    if notification.markdown and "can't parse entities" in str(e):
+                        # Better a message with stray formatting characters than none at all
+                        logger.warning(f"Markdown rejected for {notification.chat_id}, resending as plain text: {e}")
+                        notification.markdown = False
+                        requeued = True
+                        self._schedule_retry(notification, 0)
+                    else:
+                        self.stats["dropped"] += 1
+                        metrics.inc("notifier_messages_total", outcome="dropped")
+                        logger.error(f"Failed to send message to user {notification.chat_id}: {e}")
+                except TelegramForbiddenError as e:
+                    # The user blocked the bot; retrying won't help
+                    self.stats["dropped"] += 1
+                    metrics.inc("notifier_messages_total", outcome="dropped")
+                    logger.error(f"Failed to send message to user {notification.chat_id}: {e}")
+                except asyncio.CancelledError:
+                    cancelled = True
+                    raise
+                except Exception as e:
+                    notification.attempts += 1
+                    if notification.attempts <= self.max_retries:
+                        self.stats["retried"] += 1
+                        metrics.inc("notifier_messages_total", outcome="retried")
+                        requeued = True
+                        self._schedule_retry(notification, 2 ** notification.attempts)
+                    else:
+                        self.stats["dropped"] += 1
+                        metrics.inc("notifier_messages_total", outcome="dropped")
+                        logger.error(f"Failed to send message to user {notification.chat_id}: {e}")
+                finally:
+                    if not requeued:
+                        self._finish(notification, cancelled)
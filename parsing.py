@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import importlib
+import importlib.util
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from bs4 import BeautifulSoup
+from config import HTML_PARSER, PARSE_EXECUTOR, PARSE_WORKERS, PARSE_INLINE_THRESHOLD
+from jobs import Job
+
+logger = logging.getLogger(__name__)
+
+# Parser backends that can be set with "parser" on a source in cssselectors.py
+BACKEND_HTML_PARSER = "html.parser"  # Pure Python, always available
+BACKEND_LXML = "lxml"  # BeautifulSoup on top of the lxml C parser
+BACKEND_SELECTOLAX = "selectolax"  # Lexbor/Modest engine, fastest but optional
+
+# The Python package each backend needs
+_BACKEND_PACKAGES = {
+    BACKEND_HTML_PARSER: None,
+    BACKEND_LXML: "lxml",
+    BACKEND_SELECTOLAX: "selectolax",
+}
+
+# Backends we already warned about, so a missing package is only logged once
+_warned_backends = set()
+
+# Workers scrapers are offloaded to, created lazily and closed by close_executor()
+_executor: Executor | None = None
+
+
+class SoupNode:
+    """Wraps a BeautifulSoup tag behind the small interface scrapers rely on."""
+
+    __slots__ = ("_tag",)
+
+    def __init__(self, tag):
+        self._tag = tag
+
+    def select(self, css: str) -> list:
+        return [SoupNode(tag) for tag in self._tag.select(css)]
+
+    def select_one(self, css: str):
+        tag = self._tag.select_one(css)
+        return SoupNode(tag) if tag is not None else None
+
+    def attr(self, name: str) -> str | None:
+        value = self._tag.get(name)
+        # BeautifulSoup returns multi-valued attributes such as 'class' as lists
+        return " ".join(value) if isinstance(value, list) else value
+
+    @property
+    def text(self) -> str:
+        return self._tag.get_text()
+
+
+class SelectolaxNode:
+    """Wraps a selectolax node behind the same interface as SoupNode."""
+
+    __slots__ = ("_node",)
+
+    def __init__(self, node):
+        self._node = node
+
+    def select(self, css: str) -> list:
+        return [SelectolaxNode(node) for node in self._node.css(css)]
+
+    def select_one(self, css: str):
+        node = self._node.css_first(css)
+        return SelectolaxNode(node) if node is not None else None
+
+    def attr(self, name: str) -> str | None:
+        return self._node.attributes.get(name)
+
+    @property
+    def text(self) -> str:
+        return self._node.text(deep=True)
+
+
+def resolve_backend(backend: str | None) -> str:
+    """
+    Returns the backend to use, falling back to html.parser if the requested one is unavailable.
+
+    Args:
+        backend (str): The requested backend name, or None for the default.
+
+    Returns:
+        str: An installed backend name.
+    """
+    backend = backend or BACKEND_HTML_PARSER
+    if backend not in _BACKEND_PACKAGES:
+        if backend not in _warned_backends:
+            logger.warning(f"Unknown HTML parser backend '{backend}'. Falling back to {BACKEND_HTML_PARSER}.")
+            _warned_backends.add(backend)
+        return BACKEND_HTML_PARSER
+
+    package = _BACKEND_PACKAGES[backend]
+    if package and importlib.util.find_spec(package) is None:
+        if backend not in _warned_backends:
+            logger.warning(f"HTML parser backend '{backend}' needs the '{package}' package. Falling back to {BACKEND_HTML_PARSER}.")
+            _warned_backends.add(backend)
+        return BACKEND_HTML_PARSER
+    return backend
+
+
+def parse_document(html: str, backend: str | None = None):
+    """
+    Parses an HTML document once with the requested backend.
+
+    Args:
+        html (str): The HTML content to parse.
+        backend (str): One of the BACKEND_* names. Defaults to html.parser.
+
+    Returns:
+        SoupNode | SelectolaxNode: The root of the parsed document.
+    """
+    backend = resolve_backend(backend)
+    if backend == BACKEND_SELECTOLAX:
+        try:
+            from selectolax.lexbor import LexborHTMLParser as HTMLParser
+        except ImportError:
+            # Older selectolax releases only ship the Modest engine
+            from selectolax.parser import HTMLParser
+        return SelectolaxNode(HTMLParser(html).root)
+    return SoupNode(BeautifulSoup(html, backend))
+
+
+def get_executor() -> Executor:
+    """Returns the shared parser pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        if PARSE_EXECUTOR == "thread":
+            _executor = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="parser")
+        else:
+            # Spawn rather than fork, since the parent runs an event loop and database threads
+            _executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        logger.info(f"Started {PARSE_EXECUTOR} parser pool.")
+    return _executor
+
+
+def _discard_executor(executor: Executor):
+    """Drops a pool whose worker died, so the next get_executor() call starts a fresh one."""
+    global _executor
+    if _executor is executor:
+        executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def close_executor():
+    """Shuts the parser pool down."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def extract_page(module_name: str, text: str, selectors: dict, watermark: int | None = None) -> tuple[list[tuple] | None, str | None]:
+    """
+    Parses a response and runs the scraper module's extract() on it.
+
+    This is the function sent to parser workers, so it only takes and returns
+    plain picklable values.
+
+    Args:
+        module_name (str): The scraper module, e.g. 'scrapers.wework'.
+        text (str): The raw response body.
+        selectors (dict): The source configuration.
+        watermark (int): The URL's high-water mark.
+
+    Returns:
+        tuple: Compact (id, title, company, link, source) records, or None if an
+            HTML page had no job cards, and the href of the link to the next
+            results page, found with the source's pagination "next_link" selector.
+    """
+    module = importlib.import_module(module_name)
+    next_link = (selectors.get("pagination") or {}).get("next_link")
+    if selectors.get("type", "html") == "api":
+        jobs = module.extract(text, selectors, watermark=watermark)
+        href = None
+    else:
+        document = parse_document(text, selectors.get("parser", HTML_PARSER))
+        link = document.select_one(next_link) if next_link else None
+        href = link.attr("href") if link else None
+        job_cards = document.select(selectors['job_card'])
+        if not job_cards:
+            return None, href
+        jobs = module.extract(job_cards, selectors, watermark=watermark)
+    return [job.as_record() for job in jobs], href
+
+
+async def run_page_extraction(module_name: str, text: str, selectors: dict,
+                              watermark: int | None = None) -> tuple[list[Job] | None, str | None]:
+    """
+    Runs extract_page() in the parser pool, or inline for small responses.
+
+    Returns:
+        tuple: The jobs, or None if an HTML page had no job cards, and
+            the href of the next results page, if any.
+    """
+    if PARSE_EXECUTOR == "inline" or len(text) < PARSE_INLINE_THRESHOLD:
+        records, href = extract_page(module_name, text, selectors, watermark)
+    else:
+        loop = asyncio.get_running_loop()
+        executor = get_executor()
+        try:
+            records, href = await loop.run_in_executor(executor, extract_page, module_name, text, selectors, watermark)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory) and took the whole pool with it;
+            # try once more on a fresh pool rather than failing every later parse
+            logger.warning(f"Parser pool broke while parsing for {module_name}; restarting it.")
+            _discard_executor(executor)
+            executor = get_executor()
+            try:
+                records, href = await loop.run_in_executor(executor, extract_page, module_name, text, selectors, watermark)
+            except BrokenProcessPool:
+                _discard_executor(executor)
+                raise
+    if records is None:
+        return None, href
+    # Rebuilt on this side so the strings are interned in the bot's process
+    return [Job(*record) for record in records], href
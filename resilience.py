@@ -0,0 +1,159 @@
+# job_alert_bot/resilience.py
+
+import email.utils
+import logging
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+import metrics
+from config import (
+    HTTP_RETRY_BASE_DELAY, HTTP_RETRY_MAX_DELAY, HTTP_ADAPTIVE_TIMEOUT, HTTP_TIMEOUT_MIN,
+    HTTP_TIMEOUT_PERCENTILE, HTTP_TIMEOUT_MULTIPLIER, HTTP_LATENCY_WINDOW, HTTP_LATENCY_MIN_SAMPLES,
+    HTTP_HEDGE_PERCENTILE, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# Latency history and breaker per host, so one struggling job board only slows itself down
+_trackers: dict[str, "LatencyTracker"] = {}
+_breakers: dict[str, "CircuitBreaker"] = {}
+
+
+class LatencyTracker:
+    """Keeps a host's recent response times to derive its timeout and hedging delay."""
+
+    def __init__(self, window: int = HTTP_LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, share: float) -> float | None:
+        """Returns the given percentile of recent latencies, or None until there are enough samples."""
+        if len(self._samples) < HTTP_LATENCY_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+    def timeout(self, ceiling: float) -> float:
+        """
+        Returns the timeout for the next request: a multiple of the recent tail
+        latency, so a hanging request to a usually fast host is given up early,
+        but never more than the configured ceiling.
+        """
+        tail = self.percentile(HTTP_TIMEOUT_PERCENTILE) if HTTP_ADAPTIVE_TIMEOUT else None
+        if tail is None:
+            return ceiling
+        return min(ceiling, max(HTTP_TIMEOUT_MIN, tail * HTTP_TIMEOUT_MULTIPLIER))
+
+    def hedge_delay(self) -> float | None:
+        """Returns how long to wait before sending a backup request, or None while latency is unknown."""
+        return self.percentile(HTTP_HEDGE_PERCENTILE)
+
+
+class CircuitBreaker:
+    """
+    Stops requests to a host after CIRCUIT_FAILURE_THRESHOLD failures in a row.
+
+    Once CIRCUIT_RESET_TIMEOUT seconds have passed, a single probe request is let
+    through: if it succeeds the circuit closes again, otherwise it stays open for
+    another reset timeout.
+    """
+
+    def __init__(self, host: str, threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.host = host
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """Returns whether a request may be sent now."""
+        if self._opened_at is None:
+            return True
+        if self._probing or time.monotonic() - self._opened_at < self.reset_timeout:
+            return False
+        self._probing = True
+        logger.info(f"Circuit for {self.host} half-open, sending a probe request.")
+        return True
+
+    def record_success(self):
+        if self._opened_at is not None:
+            logger.info(f"Circuit for {self.host} closed again.")
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+        metrics.set_gauge("scraper_circuit_open", 0, host=self.host)
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing:
+            logger.warning(f"Probe to {self.host} failed; circuit stays open for another {self.reset_timeout:.0f}s.")
+        elif self._opened_at is None and self.failures >= self.threshold:
+            logger.warning(
+                f"Circuit for {self.host} opened after {self.failures} failures in a row; "
+                f"skipping it for {self.reset_timeout:.0f}s."
+            )
+        else:
+            return
+        self._opened_at = time.monotonic()
+        self._probing = False
+        metrics.set_gauge("scraper_circuit_open", 1, host=self.host)
+
+    def release_probe(self):
+        """Lets another probe through when the current one ended without an answer, e.g. was cancelled."""
+        self._probing = False
+
+
+def latency_tracker(host: str) -> LatencyTracker:
+    """Returns the latency history for a host."""
+    if host not in _trackers:
+        _trackers[host] = LatencyTracker()
+    return _trackers[host]
+
+
+def circuit_breaker(host: str) -> CircuitBreaker:
+    """Returns the circuit breaker for a host."""
+    if host not in _breakers:
+        _breakers[host] = CircuitBreaker(host)
+    return _breakers[host]
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parses a Retry-After header, given either in seconds or as an HTTP date, into seconds from now."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float | None:
+    """
+    Returns how long to wait before retry number attempt + 1.
+
+    Uses exponential backoff with full jitter, so clients that failed together
+    don't retry together. A Retry-After from the server is honoured as the
+    minimum wait.
+
+    Returns:
+        float | None: The delay in seconds, or None if the server asked us to
+            wait longer than HTTP_RETRY_MAX_DELAY, in which case we give up.
+    """
+    if retry_after is not None and retry_after > HTTP_RETRY_MAX_DELAY:
+        return None
+    delay = random.uniform(0, min(HTTP_RETRY_MAX_DELAY, HTTP_RETRY_BASE_DELAY * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
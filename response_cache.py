@@ -0,0 +1,95 @@
+# job_alert_bot/response_cache.py
+
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, asdict
+from config import HTTP_CACHE_DIR, HTTP_CACHE_MAX_AGE, HTTP_CACHE_MAX_ENTRIES, HTTP_CACHE_EVICT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# When evict() last scanned the cache directory
+_last_evicted = 0.0
+
+
+@dataclass
+class CacheEntry:
+    """What we remember about the last successful response for a URL."""
+    url: str
+    content_hash: str
+    etag: str | None = None
+    last_modified: str | None = None
+    fetched_at: float = 0.0
+
+    def is_fresh(self) -> bool:
+        return time.time() - self.fetched_at < HTTP_CACHE_MAX_AGE
+
+    def conditional_headers(self) -> dict:
+        """Returns the validators to send so the server can answer 304 Not Modified."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _entry_path(url: str) -> str:
+    return os.path.join(HTTP_CACHE_DIR, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+
+def get(url: str) -> CacheEntry | None:
+    """Returns the cached entry for a URL, or None if there is none or it is older than the max age."""
+    try:
+        with open(_entry_path(url), encoding="utf-8") as f:
+            entry = CacheEntry(**json.load(f))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError) as e:
+        logger.warning(f"Ignoring unreadable cache entry for {url}: {e}")
+        return None
+    return entry if entry.url == url and entry.is_fresh() else None
+
+
+def put(entries: list[CacheEntry]):
+    """Writes entries to disk, then evicts expired and excess ones if it hasn't done so recently."""
+    os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+    for entry in entries:
+        path = _entry_path(entry.url)
+        # Write to a temporary file first so a crash never leaves a half-written entry
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(entry), f)
+        os.replace(tmp_path, path)
+    # Runs commit after every streamed batch, and each eviction stats the whole directory
+    if time.time() - _last_evicted >= HTTP_CACHE_EVICT_INTERVAL:
+        evict()
+
+
+def evict():
+    """Removes entries older than HTTP_CACHE_MAX_AGE and the oldest ones beyond HTTP_CACHE_MAX_ENTRIES."""
+    global _last_evicted
+    _last_evicted = time.time()
+    try:
+        files = [e for e in os.scandir(HTTP_CACHE_DIR) if e.is_file() and e.name.endswith(".json")]
+    except FileNotFoundError:
+        return
+
+    now = time.time()
+    files.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    removed = 0
+    for index, file in enumerate(files):
+        if index >= HTTP_CACHE_MAX_ENTRIES or now - file.stat().st_mtime >= HTTP_CACHE_MAX_AGE:
+            try:
+                os.remove(file.path)
+                removed += 1
+            except OSError:
+                pass
+    if removed:
+        logger.info(f"Evicted {removed} HTTP cache entries.")
@@ -1,83 +1,408 @@
 # job_alert_bot/scheduler.py
 
+import asyncio
+import itertools
 import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
 from aiogram import Bot
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 import scraper
 import database as db
-from config import SCHEDULED_JOB_TIME
+import metrics
+from config import (
+    DEFAULT_DELIVERY_MODE, SCRAPE_INTERVAL_MINUTES, SCRAPE_JITTER_SECONDS,
+    SCHEDULER_MISFIRE_GRACE_TIME, JOB_RETENTION_DAYS, PRUNE_INTERVAL_HOURS
+)
+from cssselectors import SELECTORS
+from jobs import Job
+from alerts import DELIVERY_MODE_DIGEST, format_job_alert, build_digest_messages
+from matcher import KeywordMatcher
+from notifier import NotificationDispatcher
 
 logger = logging.getLogger(__name__)
 
-async def job_processor(bot: Bot):
+# The keyword automaton, rebuilt only when the set of subscribed keywords changes
+_matcher: KeywordMatcher | None = None
+_matcher_version = -1
+
+# Outbox IDs of alerts that went out, marked delivered in the background by flush_delivered()
+_delivered: list[int] = []
+_delivered_task: asyncio.Task | None = None
+
+
+def get_matcher(keywords) -> KeywordMatcher:
+    """Returns the keyword matcher for the current subscriptions, rebuilding it if a keyword was added or removed."""
+    global _matcher, _matcher_version
+    version = db.get_keywords_version()
+    if _matcher is None or _matcher_version != version:
+        _matcher = KeywordMatcher(keywords)
+        _matcher_version = version
+        logger.info(f"Rebuilt keyword matcher for {len(_matcher)} keywords.")
+    return _matcher
+
+
+def _on_delivered(outbox_ids: list[int]):
+    """Called as alerts go out; batches their outbox rows up to be marked delivered."""
+    global _delivered_task
+    _delivered.extend(outbox_ids)
+    if _delivered_task is None or _delivered_task.done():
+        _delivered_task = asyncio.ensure_future(_mark_delivered())
+
+
+async def _mark_delivered():
+    """Marks the batched outbox rows delivered, until no more are waiting."""
+    while _delivered:
+        outbox_ids = _delivered[:]
+        _delivered.clear()
+        try:
+            await db.mark_delivered(outbox_ids)
+        except Exception as e:
+            # They'll be sent again if the run is ever resumed, which beats losing them
+            logger.error(f"Failed to mark {len(outbox_ids)} alerts delivered: {e}")
+
+
+async def flush_delivered():
     """
-    The main job function that scrapes, processes, and sends alerts.
-    
+    Marks the outbox rows of every alert that has gone out so far as delivered,
+    waiting for a background batch already being written. Call before closing the database.
+    """
+    while _delivered or (_delivered_task is not None and not _delivered_task.done()):
+        if _delivered_task is not None and not _delivered_task.done():
+            await asyncio.gather(_delivered_task, return_exceptions=True)
+        else:
+            await _mark_delivered()
+
+
+def _interleave(alerts_by_user: dict[int, list]) -> list:
+    """Orders alerts one user at a time, round-robin, so one user's burst doesn't queue ahead of everyone else's."""
+    rounds = itertools.zip_longest(*alerts_by_user.values())
+    return [alert for alerts in rounds for alert in alerts if alert is not None]
+
+
+async def send_alerts(dispatcher: NotificationDispatcher, user_id: int, messages: list[str], outbox_ids: list[int],
+                      on_message_done=None):
+    """
+    Queues a user's messages, marking the alerts in them delivered once every one has gone out.
+    on_message_done, if given, is called as each message is sent or dropped.
+    """
+    remaining = len(messages)
+
+    def on_done():
+        nonlocal remaining
+        if on_message_done is not None:
+            on_message_done()
+        remaining -= 1
+        if not remaining:
+            _on_delivered(outbox_ids)
+
+    for message in messages:
+        await dispatcher.enqueue(user_id, message, on_done=on_done)
+
+
+async def deliver_outbox(run_id: int, enqueue, digest_only: bool = False):
+    """
+    Sends a run's undelivered alerts from the outbox: each instant alert on its
+    own, and each user's digest alerts packed into digest messages.
+
+    Args:
+        run_id (int): The run whose alerts to send.
+        enqueue (coroutine function): Called with (user_id, messages, outbox_ids).
+        digest_only (bool): Only send digests, e.g. when instant alerts are already queued.
+    """
+    instant, digests = {}, {}
+    for outbox_id, user_id, job, keywords, digest in await db.get_undelivered_alerts(run_id, digest_only):
+        (digests if digest else instant).setdefault(user_id, []).append((outbox_id, user_id, job, keywords))
+    for outbox_id, user_id, job, keywords in _interleave(instant):
+        await enqueue(user_id, [format_job_alert(job, keywords)], [outbox_id])
+    for user_id, matches in digests.items():
+        messages = build_digest_messages([(job, keywords) for _, _, job, keywords in matches])
+        await enqueue(user_id, messages, [outbox_id for outbox_id, _, _, _ in matches])
+
+
+async def resume_runs(bot: Bot, dispatcher: NotificationDispatcher | None = None, run_ids: list[int] | None = None):
+    """
+    Finishes runs a previous process left behind, sending the alerts they
+    matched but never delivered, instead of scraping and matching again.
+
+    Alerts that were sent just before a crash, but not yet marked delivered,
+    are sent again.
+
     Args:
         bot (Bot): The aiogram Bot instance to send messages with.
+        dispatcher (NotificationDispatcher): The running dispatcher to queue alerts on.
+            If omitted, a temporary one is started and drained before returning.
+        run_ids (list): The runs to finish, from db.get_unfinished_runs(). Look them up
+            before scheduling new runs, or a run that just started would be taken over.
     """
-    logger.info("Daily scraping job started...")
-    
-    # 1. Scrape all jobs from all websites
-    all_jobs = await scraper.scrape_all_sites()
-    if not all_jobs:
-        logger.info("No new jobs found. Job run finished.")
+    if run_ids is None:
+        run_ids = await db.get_unfinished_runs()
+    if not run_ids:
         return
-        
-    # 2. Get all user subscriptions from the database
+    owns_dispatcher = dispatcher is None
+    if owns_dispatcher:
+        dispatcher = NotificationDispatcher(bot)
+        dispatcher.start()
+
+    resumed = 0
+
+    async def enqueue(user_id: int, messages: list[str], outbox_ids: list[int]):
+        nonlocal resumed
+        await send_alerts(dispatcher, user_id, messages, outbox_ids)
+        resumed += len(outbox_ids)
+
+    try:
+        for run_id in run_ids:
+            await deliver_outbox(run_id, enqueue)
+            await db.finish_run(run_id, status=db.RUN_INTERRUPTED)
+    finally:
+        if owns_dispatcher:
+            await dispatcher.join()
+            await dispatcher.stop()
+            await flush_delivered()
+    logger.info(f"Resumed {len(run_ids)} unfinished runs with {resumed} undelivered alerts.")
+
+
+async def job_processor(bot: Bot, dispatcher: NotificationDispatcher | None = None):
+    """
+    The main job function that scrapes every source and queues alerts as each page arrives.
+    
+    Args:
+        bot (Bot): The aiogram Bot instance to send messages with.
+        dispatcher (NotificationDispatcher): The running dispatcher to queue alerts on.
+            If omitted, a temporary one is started and drained before returning.
+    """
+    logger.info("Job run started...")
+    await process_stream(scraper.stream_jobs(), bot, dispatcher)
+
+
+async def scrape_stage(source: str, bot: Bot, dispatcher: NotificationDispatcher | None = None):
+    """Scheduled per source: scrapes it and matches each page's jobs as soon as it is parsed."""
+    await process_stream(scraper.stream_jobs([source]), bot, dispatcher, source)
+
+
+async def process_jobs(all_jobs: list[Job], urls: set[str], bot: Bot, dispatcher: NotificationDispatcher | None = None):
+    """
+    Deduplicates and matches already scraped jobs, then queues alerts for them.
+
+    Args:
+        all_jobs (list): The scraped jobs.
+        urls (set): The URLs the jobs were scraped from, committed once they are recorded.
+        bot (Bot): The aiogram Bot instance to send messages with.
+        dispatcher (NotificationDispatcher): The running dispatcher to queue alerts on.
+            If omitted, a temporary one is started and drained before returning.
+    """
+    async def single_batch():
+        yield urls, all_jobs
+
+    await process_stream(single_batch(), bot, dispatcher)
+
+
+async def process_stream(batches, bot: Bot, dispatcher: NotificationDispatcher | None = None, source: str | None = None):
+    """
+    Deduplicates and matches jobs batch by batch as they are scraped, queueing alerts right away.
+
+    Users in instant mode are alerted as soon as the batch holding a match is
+    processed, so one slow source no longer holds up everyone's alerts. Digest
+    users' matches are collected over the whole run and sent once it ends.
+    Queueing waits while the dispatcher's queue is full, which in turn pauses
+    the scrapers feeding the stream.
+
+    The run is journaled: each batch's new jobs are recorded together with the
+    alerts matched on them in the run's outbox, and alerts are marked delivered
+    as they go out, so resume_runs() can finish a run cut short by a crash.
+
+    Args:
+        batches (async iterable): (urls, jobs) pairs, e.g. from scraper.stream_jobs().
+            The URLs are committed once the batch's jobs are recorded.
+        bot (Bot): The aiogram Bot instance to send messages with.
+        dispatcher (NotificationDispatcher): The running dispatcher to queue alerts on.
+            If omitted, a temporary one is started and drained before returning.
+        source (str): The source being scraped, noted in the run journal.
+    """
+    # Everything recorded while the run goes on, in the tasks it starts too, is counted for its summary
+    with metrics.run_counters() as counters:
+        owns_dispatcher = dispatcher is None
+        if owns_dispatcher:
+            dispatcher = NotificationDispatcher(bot)
+            dispatcher.start()
+
+        started = time.perf_counter()
+        run = {
+            "urls": 0, "jobs_scraped": 0, "jobs_new": 0, "notifications_queued": 0,
+            "users_notified": set(), "first_alert_seconds": None,
+        }
+        delivery_modes = await db.get_all_delivery_modes()
+        run_id = await db.start_run(source)
+        # The summary is logged once the run's last message is sent or dropped, so
+        # it covers delivery too; messages still queued when the bot stops never are
+        summary = None
+        messages_done = 0
+
+        def message_done():
+            nonlocal messages_done
+            messages_done += 1
+            if summary is not None and messages_done == run["notifications_queued"]:
+                metrics.log_run_summary(counters, **summary)
+
+        async def enqueue(user_id: int, messages: list[str], outbox_ids: list[int]):
+            await send_alerts(dispatcher, user_id, messages, outbox_ids, message_done)
+            run["notifications_queued"] += len(messages)
+            run["users_notified"].add(user_id)
+            if run["first_alert_seconds"] is None:
+                run["first_alert_seconds"] = round(time.perf_counter() - started, 3)
+
+        try:
+            async for urls, jobs in batches:
+                run["urls"] += len(urls)
+                run["jobs_scraped"] += len(jobs)
+                run["jobs_new"] += await _process_batch(run_id, jobs, urls, delivery_modes, enqueue)
+
+            # Digest alerts wait in the outbox until the run has matched everything
+            await deliver_outbox(run_id, enqueue, digest_only=True)
+            await db.finish_run(
+                run_id, jobs_scraped=run["jobs_scraped"], jobs_new=run["jobs_new"], alerts=run["notifications_queued"]
+            )
+        finally:
+            if owns_dispatcher:
+                await dispatcher.join()
+                await dispatcher.stop()
+                await flush_delivered()
+
+        if not run["jobs_scraped"]:
+            logger.info("No new jobs found. Job run finished.")
+        else:
+            logger.info(
+                f"Job run finished. Queued {run['notifications_queued']} notifications "
+                f"for {len(run['users_notified'])} users."
+            )
+    summary = {
+        **run, "users_notified": len(run["users_notified"]), "source": source,
+        "keywords": len(await db.get_all_unique_keywords()),
+    }
+    if messages_done == run["notifications_queued"]:
+        metrics.log_run_summary(counters, **summary)
+
+
+async def _process_batch(run_id: int, jobs: list[Job], urls: set[str], delivery_modes: dict, enqueue) -> int:
+    """
+    Deduplicates and matches one batch of jobs, records them with their alerts
+    in the run's outbox, and queues the instant alerts. Returns the number of new jobs.
+    """
+    if not jobs:
+        # Nothing to record, so unchanged responses can be skipped next time
+        await scraper.commit_run(urls)
+        return 0
+
     subscriptions = await db.get_all_subscriptions()
     if not subscriptions:
-        logger.info("No user subscriptions found. Job run finished.")
-        return
-        
-    # 3. Process and send alerts
-    notifications_sent = 0
-    for job in all_jobs:
-        # Avoid sending duplicate jobs
-        if await db.is_job_posted(job['id']):
-            continue
-
-        job_title_lower = job['title'].lower()
-        
-        # Check for matching keywords
-        for keyword, user_ids in subscriptions.items():
-            if keyword.lower() in job_title_lower:
-                message = (
-                    f"📢 **New Job Alert: {keyword}**\n\n"
-                    f"**Title:** {job['title']}\n"
-                    f"**Company:** {job['company']}\n"
-                    f"**Source:** {job['source']}\n\n"
-                    f"[View Job]({job['link']})"
-                )
-                
-                # Send the alert to all users subscribed to this keyword
-                for user_id in user_ids:
-                    try:
-                        await bot.send_message(user_id, message, parse_mode="Markdown", disable_web_page_preview=True)
-                        notifications_sent += 1
-                    except Exception as e:
-                        logger.error(f"Failed to send message to user {user_id}: {e}")
-
-        # Add the job to the database to mark it as sent
-        await db.add_posted_job(job['id'], job['title'], job['company'], job['link'], job['source'])
-
-    logger.info(f"Daily scraping job finished. Sent {notifications_sent} notifications.")
-
-
-def setup_scheduler(bot: Bot):
-    """Initializes and starts the APScheduler."""
-    scheduler = AsyncIOScheduler()
-    
-    # Schedule job_processor to run daily at the time specified in config
-    time = SCHEDULED_JOB_TIME.split(':')
-    hour, minute = int(time[0]), int(time[1])
-    
+        logger.info("No user subscriptions found.")
+        return 0
+
+    match_started = time.perf_counter()
+    # Reuse the keyword automaton instead of testing every keyword against every title
+    matcher = get_matcher(subscriptions.keys())
+
+    # Avoid sending duplicate jobs, checking the whole batch at once
+    unposted_ids = set(await db.filter_unposted_jobs([job.id for job in jobs]))
+    new_jobs = [job for job in jobs if job.id in unposted_ids]
+    logger.info(f"{len(new_jobs)} of {len(jobs)} scraped jobs are new.")
+    metrics.inc("pipeline_jobs_new_total", len(new_jobs))
+    metrics.inc("pipeline_jobs_deduplicated_total", len(jobs) - len(new_jobs))
+
+    # Group every match per user so a job reaches each user once, whatever the number of keywords it matched
+    matches_by_user = {}
+    for job in new_jobs:
+        for keyword in matcher.match(job.title):
+            # The last subscriber may have left while we were checking for duplicates
+            for user_id in subscriptions.get(keyword, ()):
+                user_matches = matches_by_user.setdefault(user_id, {})
+                user_matches.setdefault(job.id, (job, []))[1].append(keyword)
+
+    alerts = [
+        (user_id, job, keywords, delivery_modes.get(user_id, DEFAULT_DELIVERY_MODE) == DELIVERY_MODE_DIGEST)
+        for user_id, user_matches in matches_by_user.items()
+        for job, keywords in user_matches.values()
+    ]
+    metrics.observe("pipeline_match_seconds", time.perf_counter() - match_started)
+
+    # Mark the jobs as sent and write their alerts to the outbox in one transaction,
+    # so from here on a crash neither loses an alert nor matches the jobs again
+    outbox_ids = await db.record_matches(run_id, new_jobs, alerts)
+    instant = {}
+    for outbox_id, (user_id, job, keywords, digest) in zip(outbox_ids, alerts):
+        if not digest:
+            instant.setdefault(user_id, []).append((outbox_id, user_id, job, keywords))
+    for outbox_id, user_id, job, keywords in _interleave(instant):
+        await enqueue(user_id, [format_job_alert(job, keywords)], [outbox_id])
+    # Only now is it safe to skip these listings and unchanged responses next time
+    await scraper.commit_run(urls)
+    return len(new_jobs)
+
+
+def setup_scheduler(bot: Bot | None = None, dispatcher: NotificationDispatcher | None = None, stage=None):
+    """
+    Initializes and starts the APScheduler.
+
+    Every source gets its own scrape job on the interval and jitter declared in
+    cssselectors.py, which streams each page's jobs straight into matching.
+    Delivery runs continuously in the NotificationDispatcher, and periodic
+    prunes forget posted jobs past JOB_RETENTION_DAYS and journaled runs past
+    RUN_JOURNAL_RETENTION_DAYS.
+
+    Args:
+        bot (Bot): The aiogram Bot instance to send messages with.
+        dispatcher (NotificationDispatcher): The running dispatcher to queue alerts on.
+        stage (coroutine function): Runs per source instead of scrape_stage, called
+            with just the source name. Worker mode uses it to queue scrape tasks.
+    """
+    scheduler = AsyncIOScheduler(timezone="UTC")
+    now = datetime.now(timezone.utc)
+
+    for source, selectors in SELECTORS.items():
+        interval = selectors.get("interval_minutes", SCRAPE_INTERVAL_MINUTES)
+        jitter = selectors.get("jitter_seconds", SCRAPE_JITTER_SECONDS)
+        scheduler.add_job(
+            stage or scrape_stage,
+            trigger=IntervalTrigger(
+                minutes=interval,
+                jitter=jitter,
+                # Spread the first runs over the interval so sources don't all fire at once
+                start_date=now + timedelta(seconds=random.uniform(0, interval * 60)),
+            ),
+            args=[source] if stage else [source, bot, dispatcher],
+            id=f"scrape:{source}",
+            # Skip a run while the previous one for this source is still going,
+            # and collapse runs missed while the bot was busy into one
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=SCHEDULER_MISFIRE_GRACE_TIME,
+        )
+        logger.info(f"Scheduled {source} every {interval} min (±{jitter}s jitter).")
+
+    # Keeps the run journal and outbox bounded
     scheduler.add_job(
-        job_processor,
-        trigger=CronTrigger(hour=hour, minute=minute, timezone="UTC"),
-        args=[bot]
+        db.prune_runs,
+        trigger=IntervalTrigger(hours=PRUNE_INTERVAL_HOURS),
+        id="prune_runs",
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=SCHEDULER_MISFIRE_GRACE_TIME,
     )
-    
+
+    if JOB_RETENTION_DAYS:
+        # Keeps the dedup table bounded; the first prune runs one interval after startup
+        scheduler.add_job(
+            db.prune_posted_jobs,
+            trigger=IntervalTrigger(hours=PRUNE_INTERVAL_HOURS),
+            id="prune",
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=SCHEDULER_MISFIRE_GRACE_TIME,
+        )
+
     scheduler.start()
-    logger.info(f"Scheduler started. Job will run daily at {SCHEDULED_JOB_TIME} UTC.")
\ No newline at end of file
+    logger.info(f"Scheduler started with {len(SELECTORS)} sources.")
+    return scheduler
\ No newline at end of file
@@ -1,12 +1,26 @@
 import httpx
 import asyncio
+import dataclasses
 import logging
 import importlib
+import importlib.util
 import pkgutil
+import time
 import urllib.parse
-from config import HTTP_HEADERS
+from config import (
+    HTTP_HEADERS, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE_CONNECTIONS, HTTP_KEEPALIVE_EXPIRY,
+    HTTP2_ENABLED, HTTP_TIMEOUT, HTTP_PER_HOST_CONCURRENCY, HTML_PARSER, HTTP_CACHE_ENABLED, STREAM_QUEUE_SIZE,
+    HTTP_RETRIES, HTTP_RETRY_STATUSES, HTTP_HEDGE_ENABLED, PAGINATION_MAX_PAGES
+)
+import response_cache
+import resilience
+import snapshots
+import metrics
+from parsing import parse_document, run_page_extraction
+from jobs import Job
 from cssselectors import SELECTORS
 import scrapers
+from scrapers import job_sequence
 import database as db
 from config import LOGGING_LEVEL
 
@@ -19,97 +33,607 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-async def fetch_html(url: str) -> str | None:
-   
-    async with httpx.AsyncClient(headers=HTTP_HEADERS, follow_redirects=True) as client:
+# Long-lived client shared by every scraper, created lazily and closed by close_client()
+_client: httpx.AsyncClient | None = None
+# One semaphore per host so a single board never sees more than its allowed concurrency
+_host_semaphores: dict[str, asyncio.Semaphore] = {}
+# Requests currently on the wire, keyed by URL, so concurrent callers share one response
+_inflight: dict[tuple, asyncio.Future] = {}
+# Cache entries and high-water marks from this run, saved by commit_run()
+_pending_cache_entries: dict[str, response_cache.CacheEntry] = {}
+_pending_watermarks: dict[str, tuple[str, int]] = {}
+
+# Returned by fetch_html(conditional=True) when the content hasn't changed since the last run
+NOT_MODIFIED = object()
+
+# How a source is fetched: once per run, or once per subscribed keyword
+FETCH_MODE_GLOBAL = "global"
+FETCH_MODE_KEYWORD = "keyword"
+
+
+def get_client() -> httpx.AsyncClient:
+    """Returns the shared pooled HTTP client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        http2 = HTTP2_ENABLED
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed. Falling back to HTTP/1.1.")
+            http2 = False
+
+        _client = httpx.AsyncClient(
+            headers=HTTP_HEADERS,
+            follow_redirects=True,
+            http2=http2,
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    """Closes the shared HTTP client and releases its pooled connections."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.info("HTTP client closed.")
+    _client = None
+    _host_semaphores.clear()
+
+
+def _host_semaphore(url: str, limit: int) -> asyncio.Semaphore:
+    """Returns the concurrency limiter for the host of the given URL."""
+    host = urllib.parse.urlsplit(url).netloc
+    if host not in _host_semaphores:
+        _host_semaphores[host] = asyncio.Semaphore(limit)
+    return _host_semaphores[host]
+
+
+async def _send(url: str, headers: dict | None, host: str, limit: int, timeout: float) -> httpx.Response:
+    """Sends one GET request within the per-host concurrency cap and records its latency."""
+    tracker = resilience.latency_tracker(host)
+    async with _host_semaphore(url, limit):
+        start = time.perf_counter()
         try:
-            response = await client.get(url, timeout=15.0)
-            response.raise_for_status()
-            return response.text
+            with metrics.timer("scraper_fetch_seconds", host=host):
+                response = await get_client().get(url, timeout=timeout, headers=headers)
+        except httpx.TimeoutException:
+            # Count the timeout as a slow response, so a host that got slower earns a longer timeout
+            tracker.record(timeout)
+            raise
+        tracker.record(time.perf_counter() - start)
+    metrics.inc("scraper_responses_total", host=host, status=response.status_code)
+    metrics.inc("scraper_bytes_downloaded_total", len(response.content), host=host)
+    return response
+
+
+async def _send_hedged(url: str, selectors: dict, headers: dict | None, host: str, limit: int) -> httpx.Response:
+    """
+    Sends a request with the host's adaptive timeout. If hedging is on and the
+    response is slower than usual, a backup request is sent and whichever
+    answers first is used.
+    """
+    tracker = resilience.latency_tracker(host)
+    timeout = tracker.timeout(selectors.get("timeout", HTTP_TIMEOUT))
+    hedge_after = tracker.hedge_delay() if selectors.get("hedge", HTTP_HEDGE_ENABLED) else None
+
+    first = asyncio.ensure_future(_send(url, headers, host, limit, timeout))
+    if hedge_after is None:
+        return await first
+    done, _ = await asyncio.wait({first}, timeout=hedge_after)
+    # Don't queue a backup behind the host's concurrency cap; it would only add load
+    if done or _host_semaphore(url, limit).locked():
+        return await first
+
+    logger.debug(f"{url} slower than {hedge_after:.2f}s, sending a hedged request.")
+    metrics.inc("scraper_hedged_requests_total", host=host)
+    pending = {first, asyncio.ensure_future(_send(url, headers, host, limit, timeout))}
+    try:
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            answered = [task for task in done if task.exception() is None]
+            if answered:
+                return answered[0].result()
+            if not pending:
+                # Both failed; raise the error
+                return done.pop().result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _fetch(url: str, selectors: dict, conditional: bool) -> str | None:
+    """
+    Performs the actual GET request, respecting the per-host concurrency cap.
+
+    429 and 5xx answers and network errors are retried with jittered exponential
+    backoff, honouring Retry-After. Every failed attempt counts towards the
+    host's circuit breaker, and while it is open the fetch fails at once.
+    """
+    limit = selectors.get("max_concurrency", HTTP_PER_HOST_CONCURRENCY)
+    retries = selectors.get("retries", HTTP_RETRIES)
+
+    cached = response_cache.get(url) if conditional else None
+    headers = cached.conditional_headers() if cached else None
+    host = urllib.parse.urlsplit(url).netloc
+    breaker = resilience.circuit_breaker(host)
+
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            logger.warning(f"Skipping {url}: {host} is failing and its circuit is open.")
+            metrics.inc("scraper_short_circuited_total", host=host)
+            return None
+
+        response, retry_after = None, None
+        try:
+            response = await _send_hedged(url, selectors, headers, host, limit)
         except httpx.RequestError as e:
-            logger.error(f"Error fetching URL {url}: {e}")
+            failure = f"{type(e).__name__}: {e}"
+            metrics.inc("scraper_fetch_errors_total", host=host)
+        except BaseException:
+            # Neither a success nor a failure (cancelled, or an unexpected error);
+            # don't leave the host waiting on a probe that will never report back
+            breaker.release_probe()
+            raise
+        else:
+            if response.status_code not in HTTP_RETRY_STATUSES:
+                breaker.record_success()
+                break
+            failure = f"HTTP {response.status_code}"
+            retry_after = resilience.parse_retry_after(response.headers.get("Retry-After"))
+
+        breaker.record_failure()
+        delay = resilience.backoff_delay(attempt, retry_after) if attempt < retries and not breaker.is_open else None
+        if delay is None:
+            logger.error(f"Error fetching URL {url}: {failure}. Giving up after {attempt + 1} attempts.")
             return None
+        attempt += 1
+        metrics.inc("scraper_retries_total", host=host)
+        logger.warning(f"Error fetching URL {url}: {failure}. Retrying in {delay:.1f}s ({attempt}/{retries}).")
+        await asyncio.sleep(delay)
 
-async def scrape_all_sites():
+    if response.status_code == 304 and cached:
+        logger.info(f"{url} not modified since last fetch.")
+        metrics.inc("scraper_not_modified_total", host=host)
+        return NOT_MODIFIED
+    if response.is_error:
+        # Not worth retrying, e.g. 404 for a page that no longer exists
+        logger.error(f"Error fetching URL {url}: HTTP {response.status_code}.")
+        return None
+
+    if conditional:
+        digest = response_cache.content_hash(response.content)
+        unchanged = cached is not None and cached.content_hash == digest
+        # Validators are only saved once the run that used this response commits
+        _pending_cache_entries[url] = response_cache.CacheEntry(
+            url=url,
+            content_hash=digest,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            fetched_at=time.time(),
+        )
+        if unchanged:
+            logger.info(f"{url} content unchanged since last fetch.")
+            metrics.inc("scraper_not_modified_total", host=host)
+            return NOT_MODIFIED
+    return response.text
+
+
+async def _fetch_recorded(url: str, selectors: dict, conditional: bool) -> str | None:
+    """Runs _fetch() and adds the response to the snapshot archive."""
+    started_at = time.time()
+    text = await _fetch(url, selectors, conditional)
+    await snapshots.record(url, text, started_at, time.time() - started_at)
+    return text
+
+
+async def fetch_html(url: str, selectors: dict | None = None, conditional: bool = False):
     """
-    Dynamically discovers and runs scrapers for each unique keyword.
+    Fetches a URL through the shared client.
+
+    Concurrent calls for the same URL are coalesced into a single request,
+    and every caller receives the same response body.
+
+    With SNAPSHOT_MODE = "record" every response is also saved to the snapshot
+    archive, and with "replay" it is served from there without any network;
+    see snapshots.py. Neither mode revalidates against the response cache, so
+    every recorded body is complete and every replayed one is parsed.
+
+    Args:
+        url (str): The URL to fetch.
+        selectors (dict): The source configuration, used for "timeout", "max_concurrency",
+            "retries" and "hedge".
+        conditional (bool): Revalidate against the on-disk response cache. When the server
+            answers 304 or the body hash matches the last fetch, NOT_MODIFIED is returned.
+
+    Returns:
+        str | None: The response body, NOT_MODIFIED, or None if the request failed.
     """
-    logger.info("Starting dynamic scraping process...")
+    snapshot_mode = snapshots.mode()
+    if snapshot_mode == snapshots.MODE_REPLAY:
+        return await snapshots.replay(url)
+
+    selectors = selectors or {}
+    conditional = conditional and HTTP_CACHE_ENABLED and selectors.get("cache", True) and snapshot_mode is None
+    key = (url, conditional)
+    task = _inflight.get(key)
+    if task is None:
+        fetch = _fetch_recorded if snapshot_mode == snapshots.MODE_RECORD else _fetch
+        task = asyncio.ensure_future(fetch(url, selectors, conditional))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        logger.debug(f"Joining in-flight request for {url}")
+    # Shield so one cancelled caller doesn't cancel the request for everyone else
+    return await asyncio.shield(task)
+
+
+async def commit_run(urls: set[str] | None = None):
+    """
+    Saves the high-water marks and response validators gathered for the given URLs.
+
+    Called once a run's jobs have been recorded, so a failed run never marks
+    content as already seen.
+
+    Args:
+        urls (set): The URLs whose jobs were recorded. Defaults to every pending URL.
+    """
+    if urls is None:
+        urls = set(_pending_watermarks) | set(_pending_cache_entries)
+
+    watermarks = [(url, *_pending_watermarks.pop(url)) for url in urls if url in _pending_watermarks]
+    if watermarks:
+        await db.set_source_watermarks(watermarks)
+        logger.info(f"Advanced high-water marks for {len(watermarks)} URLs.")
+
+    entries = [_pending_cache_entries.pop(url) for url in urls if url in _pending_cache_entries]
+    if entries:
+        try:
+            response_cache.put(entries)
+        except OSError as e:
+            logger.error(f"Failed to save HTTP response cache: {e}")
+
+
+def export_pending(url: str) -> dict:
+    """
+    Removes and returns a URL's uncommitted high-water mark and response validators
+    in a JSON-serializable form, so another process can commit them with
+    import_pending() and commit_run() once the URL's jobs are recorded.
+    """
+    watermark = _pending_watermarks.pop(url, None)
+    entry = _pending_cache_entries.pop(url, None)
+    return {
+        "watermark": list(watermark) if watermark else None,
+        "cache_entry": dataclasses.asdict(entry) if entry else None,
+    }
+
+
+def import_pending(url: str, state: dict):
+    """Restores state from export_pending() as this process's pending state for the URL."""
+    if state.get("watermark"):
+        _pending_watermarks[url] = tuple(state["watermark"])
+    if state.get("cache_entry"):
+        _pending_cache_entries[url] = response_cache.CacheEntry(**state["cache_entry"])
+
+
+def load_scraper_modules() -> dict:
+    """Imports every module in the 'scrapers/' package, keyed by module name."""
+    return {
+        name: importlib.import_module(f"scrapers.{name}")
+        for _, name, _ in pkgutil.iter_modules(scrapers.__path__)
+    }
+
+
+def get_fetch_mode(module, selectors: dict) -> str:
+    """
+    Returns whether a source is a keyword search or a single global feed.
+
+    A scraper module can declare this with a module-level FETCH_MODE constant.
+    Otherwise it is inferred from the presence of '{keyword}' in the source URL.
+    """
+    mode = getattr(module, "FETCH_MODE", None)
+    if mode is None:
+        mode = FETCH_MODE_KEYWORD if "{keyword}" in selectors['url'] else FETCH_MODE_GLOBAL
+    return mode
+
+
+def build_fetch_plan(keywords: list[str], scraper_modules: dict, sources: list[str] | None = None) -> dict:
+    """
+    Collapses (source x keyword) combinations into one entry per distinct URL.
+
+    Args:
+        keywords (list): The keywords to search for.
+        scraper_modules (dict): Scraper modules keyed by module name.
+        sources (list): Only plan these sources. Defaults to all of them.
+
+    Returns:
+        dict: Maps each URL to a (site_name, module, selectors) tuple.
+    """
+    plan = {}
+    for site_name, selectors in SELECTORS.items():
+        if sources is not None and site_name not in sources:
+            continue
+        # Sources default to the scraper module of the same name
+        module_name = selectors.get("module", site_name)
+        if module_name not in scraper_modules:
+            logger.warning(f"No scraper module found for '{site_name}', skipping.")
+            continue
+        module = scraper_modules[module_name]
+
+        if get_fetch_mode(module, selectors) == FETCH_MODE_GLOBAL:
+            # The feed is the same for every keyword, so it's fetched once
+            urls = [selectors['url']]
+        else:
+            # URL-encode the keyword to handle spaces, e.g., "Data Entry" -> "Data+Entry"
+            urls = [selectors['url'].format(keyword=urllib.parse.quote_plus(keyword)) for keyword in keywords]
+
+        for url in urls:
+            plan.setdefault(url, (site_name, module, selectors))
+    return plan
+
+
+async def stream_jobs(sources: list[str] | None = None, queue_size: int = STREAM_QUEUE_SIZE):
+    """
+    Dynamically discovers and runs scrapers for each distinct URL in the fetch plan,
+    yielding each URL's jobs as soon as that URL has been scraped.
+
+    Scrapers hand their results over through a bounded queue, so when the consumer
+    falls behind they wait instead of piling up parsed pages in memory.
+
+    Args:
+        sources (list): Source names from cssselectors.SELECTORS to scrape. Defaults to all of them.
+        queue_size (int): How many scraped pages may wait for the consumer.
+
+    Yields:
+        tuple: A set of URLs and the jobs scraped from them that no earlier URL in
+            this run produced. Pages that finished while the consumer was busy are
+            yielded together, so a slow consumer gets fewer, larger batches. Every
+            planned URL is yielded once, with no jobs if it failed. Pass the URLs
+            to commit_run() once their jobs have been recorded.
+    """
+    logger.info(f"Starting dynamic scraping process for {', '.join(sources) if sources else 'all sources'}...")
     unique_keywords = await db.get_all_unique_keywords()
-    
+
     if not unique_keywords:
         logger.info("No keywords to scrape for. Aborting.")
-        return []
+        return
 
     logger.info(f"Found unique keywords to search for: {unique_keywords}")
-    
-    all_jobs = []
-    processed_job_ids = set() # To avoid duplicate jobs from different keyword searches
 
-    tasks = []
-    scraper_modules = {name: importlib.import_module(f"scrapers.{name}") for _, name, _ in pkgutil.iter_modules(scrapers.__path__)}
+    plan = build_fetch_plan(unique_keywords, load_scraper_modules(), sources)
+    logger.info(f"Fetch plan has {len(plan)} distinct URLs for {len(unique_keywords)} keywords.")
 
-    for site_name, selectors in SELECTORS.items():
-        if site_name not in scraper_modules:
-            continue
-            
-        for keyword in unique_keywords:
-            # URL-encode the keyword to handle spaces, e.g., "Data Entry" -> "Data%20Entry"
-            safe_keyword = urllib.parse.quote_plus(keyword)
-            url = selectors['url'].format(keyword=safe_keyword)
-            
-            # Add a task to run the scraper for this specific site and keyword
-            tasks.append(run_scraper(site_name, scraper_modules[site_name], selectors, url))
-
-    # Gather results from all scraping tasks
-    results = await asyncio.gather(*tasks)
-    
-    for job_list in results:
-        if job_list:
-            for job in job_list:
-                # Add job only if we haven't processed it before
-                if job['id'] not in processed_job_ids:
-                    all_jobs.append(job)
-                    processed_job_ids.add(job['id'])
-            
-    logger.info(f"Total unique jobs scraped from all sites: {len(all_jobs)}")
+    # State left over from a run that never committed must not be saved later
+    for url in plan:
+        _pending_cache_entries.pop(url, None)
+        _pending_watermarks.pop(url, None)
+    watermarks = await db.get_source_watermarks()
+
+    queue = asyncio.Queue(maxsize=queue_size)
+
+    async def produce(url: str, site_name: str, module, selectors: dict):
+        jobs = await run_scraper(site_name, module, selectors, url, watermarks.get(url), db.filter_unposted_jobs)
+        await queue.put((url, jobs or []))
+
+    tasks = [
+        asyncio.create_task(produce(url, site_name, module, selectors))
+        for url, (site_name, module, selectors) in plan.items()
+    ]
+
+    processed_job_ids = set()  # To avoid duplicate jobs from different keyword searches
+    total = 0
+    remaining = len(tasks)
+    try:
+        while remaining:
+            pages = [await queue.get()]
+            while not queue.empty():
+                pages.append(queue.get_nowait())
+            remaining -= len(pages)
+
+            urls, fresh = set(), []
+            for url, jobs in pages:
+                urls.add(url)
+                for job in jobs:
+                    # Add job only if we haven't seen it on another URL this run
+                    if job.id not in processed_job_ids:
+                        fresh.append(job)
+                        processed_job_ids.add(job.id)
+            total += len(fresh)
+            yield urls, fresh
+    finally:
+        # The consumer stopped early or failed; don't leave scrapers running
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    logger.info(f"Total unique jobs scraped: {total}")
+
+
+async def scrape_sites(sources: list[str] | None = None) -> tuple[list[Job], set[str]]:
+    """
+    Scrapes every URL in the fetch plan and collects the results.
+
+    Args:
+        sources (list): Source names from cssselectors.SELECTORS to scrape. Defaults to all of them.
+
+    Returns:
+        tuple: The unique jobs scraped, and the URLs that were fetched. Pass the
+            URLs to commit_run() once the jobs have been recorded.
+    """
+    all_jobs = []
+    urls = set()
+    async for batch_urls, jobs in stream_jobs(sources):
+        all_jobs.extend(jobs)
+        urls.update(batch_urls)
+    return all_jobs, urls
+
+async def scrape_all_sites():
+    """Scrapes every source and returns the unique jobs found."""
+    all_jobs, _ = await scrape_sites()
     return all_jobs
 
-async def run_scraper(site_name: str, module, selectors: dict, url: str):
+async def run_scraper(site_name: str, module, selectors: dict, url: str, watermark: int | None = None,
+                      filter_unposted=None):
     """
     Runs a specific scraper module for a given URL, handling both HTML and API types.
+
+    The scraper only emits jobs newer than the watermark. The new high-water mark
+    for the URL is kept pending until commit_run() is called. Sources that declare
+    "pagination" also have their later results pages scraped; see _scrape_more_pages().
+    filter_unposted, e.g. db.filter_unposted_jobs, returns which of a list of job IDs
+    were never posted. Without it, paging doesn't stop at jobs known from earlier runs.
     """
     try:
         logger.info(f"Scraping {site_name} for URL: {url}")
         
         # Fetch the raw text content (could be HTML or JSON)
-        response_text = await fetch_html(url)
+        response_text = await fetch_html(url, selectors, conditional=True)
+        if response_text is NOT_MODIFIED:
+            # Everything on this page was handled by an earlier run
+            return []
         if not response_text:
             logger.error(f"Failed to fetch content for {url}. Aborting scrape for this URL.")
             return None
-        
-        # Check the 'type' and call the scraper accordingly
-        scraper_type = selectors.get("type", "html") # Default to 'html' if not specified
 
-        if scraper_type == "api":
-            
-            jobs = await module.scrape(response_text, selectors)
+        pagination = selectors.get("pagination")
+        if not pagination:
+            jobs, _ = await _extract(site_name, module, selectors, response_text, watermark)
         else:
-            
-            from bs4 import BeautifulSoup
-            
-    
-            soup = BeautifulSoup(response_text, 'html.parser')
-            jobs = []
-            
-            job_cards = soup.select(selectors['job_card'])
-            if not job_cards:
-                 logger.warning(f"No job cards found for {site_name}. Check HTML structure or selectors.")
-                 return []
-            
-            jobs = await module.scrape(response_text, selectors)
+            jobs, complete = await _scrape_more_pages(
+                site_name, module, selectors, url, response_text, watermark, pagination, filter_unposted
+            )
+            if not complete:
+                # Jobs on the pages we missed are older than the ones found, so
+                # nothing may be marked as seen until a run gets through them all
+                _pending_cache_entries.pop(url, None)
+                return jobs
 
+        sequences = [seq for seq in (job_sequence(job.id) for job in jobs) if seq is not None]
+        if sequences and (watermark is None or max(sequences) > watermark):
+            _pending_watermarks[url] = (site_name, max(sequences))
         return jobs
     except Exception as e:
         logger.error(f"An unexpected error occurred in scraper '{site_name}' for URL {url}: {e}", exc_info=True)
-    return None
\ No newline at end of file
+    return None
+
+
+async def _extract(site_name: str, module, selectors: dict, text: str, watermark: int | None) -> tuple[list[Job], str | None]:
+    """
+    Extracts the jobs newer than the watermark from one response.
+
+    Returns:
+        tuple: The jobs, and the href of the next results page if the source
+            declares a pagination "next_link" selector and the page has one.
+    """
+    # Check the 'type' and call the scraper accordingly
+    scraper_type = selectors.get("type", "html") # Default to 'html' if not specified
+    next_link = (selectors.get("pagination") or {}).get("next_link")
+    href = None
+
+    with metrics.timer("scraper_parse_seconds", source=site_name):
+        if hasattr(module, "extract"):
+            # Parse and extract off the event loop so bot handlers stay responsive
+            jobs, href = await run_page_extraction(module.__name__, text, selectors, watermark)
+            if jobs is None:
+                 logger.warning(f"No job cards found for {site_name}. Check HTML structure or selectors.")
+                 return [], href
+        elif scraper_type == "api":
+
+            jobs = await module.scrape(text, selectors, watermark=watermark)
+        else:
+            # Parse the document once and hand the selected cards to the scraper
+            document = parse_document(text, selectors.get("parser", HTML_PARSER))
+            link = document.select_one(next_link) if next_link else None
+            href = link.attr("href") if link else None
+            job_cards = document.select(selectors['job_card'])
+            if not job_cards:
+                 logger.warning(f"No job cards found for {site_name}. Check HTML structure or selectors.")
+                 return [], href
+
+            jobs = await module.scrape(job_cards, selectors, watermark=watermark)
+    metrics.inc("scraper_jobs_scraped_total", len(jobs), source=site_name)
+    return jobs, href
+
+
+def page_url(url: str, param: str, number: int) -> str:
+    """Returns the URL of a results page, setting the page number query parameter."""
+    parts = urllib.parse.urlsplit(url)
+    query = [(key, value) for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True) if key != param]
+    query.append((param, str(number)))
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query)))
+
+
+async def _scrape_more_pages(site_name: str, module, selectors: dict, url: str, first_page: str,
+                             watermark: int | None, pagination: dict, filter_unposted=None) -> tuple[list[Job], bool]:
+    """
+    Scrapes a paginated search, starting from its already fetched first page.
+
+    Results are assumed newest first, so paging stops at the first page that
+    is short (fewer than "page_size" jobs), adds no job not already seen on an
+    earlier page, or, with "stop_at_known" and a filter_unposted callback,
+    holds a job known from an earlier run. With a "param", the next pages are fetched concurrently in waves as
+    large as the source's "max_concurrency", so the per-host cap still holds.
+    With a "next_link" selector, each page's link is followed in turn.
+
+    Returns:
+        tuple: The jobs newer than the watermark across all pages scraped, and
+            False if a page failed to fetch before paging was meant to stop.
+    """
+    max_pages = pagination.get("max_pages", PAGINATION_MAX_PAGES)
+    page_size = pagination.get("page_size")
+    stop_at_known = pagination.get("stop_at_known", True) and filter_unposted is not None
+    param = pagination.get("param")
+    wave = selectors.get("max_concurrency", HTTP_PER_HOST_CONCURRENCY)
+
+    seen_ids = set()
+    found = []
+
+    async def take(text: str) -> tuple[bool, str | None]:
+        """Adds a page's new jobs to the results and says whether to fetch more pages."""
+        # Extract everything, so jobs from earlier runs can be recognised and stop the paging
+        page_jobs, href = await _extract(site_name, module, selectors, text, None)
+        new = [job for job in page_jobs if job.id not in seen_ids]
+        seen_ids.update(job.id for job in new)
+        fresh = [
+            job for job in new
+            if watermark is None or (seq := job_sequence(job.id)) is None or seq > watermark
+        ]
+        found.extend(fresh)
+        known = len(fresh) < len(new) or (
+            stop_at_known and fresh and len(await filter_unposted([job.id for job in fresh])) < len(fresh)
+        )
+        more = bool(new) and not (page_size and len(page_jobs) < page_size) and not (stop_at_known and known)
+        return more, href
+
+    more, href = await take(first_page)
+    pages = 1
+    if param:
+        number = pagination.get("start", 1) + 1
+        while more and pages < max_pages:
+            numbers = range(number, number + min(wave, max_pages - pages))
+            texts = await asyncio.gather(*(fetch_html(page_url(url, param, n), selectors) for n in numbers))
+            for text in texts:
+                pages += 1
+                if not text:
+                    logger.warning(f"Failed to fetch page {number} of {url}; stopping here for this run.")
+                    return found, False
+                number += 1
+                more, _ = await take(text)
+                if not more:
+                    break
+    else:
+        while more and href and pages < max_pages:
+            next_url = urllib.parse.urljoin(url, href)
+            text = await fetch_html(next_url, selectors)
+            pages += 1
+            if not text:
+                logger.warning(f"Failed to fetch {next_url}; stopping here for this run.")
+                return found, False
+            more, href = await take(text)
+
+    logger.info(f"Scraped {pages} pages of {url}, {len(found)} new jobs.")
+    return found, True
@@ -0,0 +1,16 @@
+import re
+
+_DIGITS = re.compile(r"\d+")
+
+
+def job_sequence(job_id: str | None) -> int | None:
+    """
+    Returns the numeric part of a job ID, used as the source's high-water mark.
+
+    Job boards hand out increasing numeric IDs, so a larger number means a
+    newer posting. Returns None when the ID has no digits to compare.
+    """
+    if not job_id:
+        return None
+    numbers = _DIGITS.findall(str(job_id))
+    return int(numbers[-1]) if numbers else None
@@ -1,21 +1,33 @@
 
 import logging
 import json
+from jobs import Job
+from scrapers import job_sequence
 
 logger = logging.getLogger(__name__)
 
-async def scrape(response_text: str, selectors: dict):
+FETCH_MODE = "global"  # The API returns the full feed regardless of keyword
+
+async def scrape(response_text: str, selectors: dict, watermark: int | None = None):
+    """Scrapes job postings from the JSON response of the remoteok.com API."""
+    return extract(response_text, selectors, watermark=watermark)
+
+def extract(response_text: str, selectors: dict, watermark: int | None = None):
     """
-    Scrapes job postings from the JSON response of the remoteok.com API.
+    Extracts job postings from the JSON response of the remoteok.com API.
+
+    Synchronous and free of shared state, so it can run in a parser worker process.
 
     Args:
         response_text (str): The JSON string from the API response.
         selectors (dict): The configuration from selectors.py (not used here but kept for consistency).
+        watermark (int): The newest job ID seen by a previous run. Older jobs are not emitted.
 
     Returns:
-        list: A list of dictionaries, where each dictionary represents a job.
+        list: A list of Job records.
     """
     jobs = []
+    skipped = 0
     
     try:
         # The first item in the response is a legal notice, so we skip it.
@@ -29,14 +41,21 @@ async def scrape(response_text: str, selectors: dict):
         if not all([job_data.get('id'), job_data.get('position'), job_data.get('url')]):
             continue
 
-        job = {
-            "id": f"remoteok_{job_data.get('id')}",
-            "title": job_data.get('position'),
-            "company": job_data.get('company'),
-            "link": job_data.get('url'),
-            "source": "RemoteOK (API)"
-        }
+        # Already known from a previous run. The feed is newest first, but we keep
+        # going rather than stopping in case a promoted listing sits at the top.
+        sequence = job_sequence(job_data.get('id'))
+        if watermark is not None and sequence is not None and sequence <= watermark:
+            skipped += 1
+            continue
+
+        job = Job(
+            id=f"remoteok_{job_data.get('id')}",
+            title=job_data.get('position'),
+            company=job_data.get('company'),
+            link=job_data.get('url'),
+            source="RemoteOK (API)"
+        )
         jobs.append(job)
 
-    logger.info(f"Scraped {len(jobs)} jobs from RemoteOK API.")
+    logger.info(f"Scraped {len(jobs)} jobs from RemoteOK API ({skipped} older than the high-water mark).")
     return jobs
\ No newline at end of file
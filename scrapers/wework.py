@@ -1,42 +1,53 @@
 # job_alert_bot/scrapers/wework.py
 
 import logging
-from bs4 import BeautifulSoup
+from jobs import Job
+from scrapers import job_sequence
 
 logger = logging.getLogger(__name__)
 
-async def scrape(html: str, selectors: dict):
+FETCH_MODE = "keyword"  # One search results page per subscribed keyword
+
+async def scrape(job_cards: list, selectors: dict, watermark: int | None = None):
+    """Scrapes job postings from the job cards of a weworkremotely.com search page."""
+    return extract(job_cards, selectors, watermark=watermark)
+
+def extract(job_cards: list, selectors: dict, watermark: int | None = None):
     """
-    Scrapes job postings from the HTML content of weworkremotely.com.
+    Extracts job postings from the job cards of a weworkremotely.com search page.
+
+    Synchronous and free of shared state, so it can run in a parser worker process.
 
     Args:
-        html (str): The HTML content of the job board page.
+        job_cards (list): Parsed job card nodes selected with selectors['job_card'].
         selectors (dict): A dictionary of CSS selectors for parsing.
+        watermark (int): The newest job ID seen by a previous run. Older jobs are not emitted.
 
     Returns:
-        list: A list of dictionaries, where each dictionary represents a job.
+        list: A list of Job records.
     """
-    soup = BeautifulSoup(html, 'html.parser')
     jobs = []
-
-    job_cards = soup.select(selectors['job_card'])
+    skipped = 0
 
     if not job_cards:
         logger.warning("No job cards found for WeWorkRemotely. Check selectors.")
         return []
 
     for card in job_cards:
-        job_id = card.get(selectors['id_attribute'])
+        job_id = card.attr(selectors['id_attribute'])
+
+        # Already known from a previous run; skip it before touching the rest of the card
+        sequence = job_sequence(job_id)
+        if watermark is not None and sequence is not None and sequence <= watermark:
+            skipped += 1
+            continue
+
         title_element = card.select_one(selectors['title'])
         company_element = card.select_one(selectors['company'])
         
         # WeWorkRemotely has multiple links, we want the main job link
-        link_elements = card.find_all('a', href=True)
-        job_link = None
-        for a in link_elements:
-            if '/remote-jobs/' in a['href']:
-                job_link = a['href']
-                break
+        link_element = card.select_one(selectors['link'])
+        job_link = link_element.attr('href') if link_element else None
         
         if not all([job_id, title_element, company_element, job_link]):
             logger.debug(f"Skipping a card on WeWorkRemotely, missing required elements.")
@@ -44,14 +55,14 @@ async def scrape(html: str, selectors: dict):
             
         link = f"https://weworkremotely.com{job_link}"
 
-        job = {
-            "id": f"wework_{job_id}", # Prefix for uniqueness
-            "title": title_element.text.strip(),
-            "company": company_element.text.strip(),
-            "link": link,
-            "source": "WeWorkRemotely"
-        }
+        job = Job(
+            id=f"wework_{job_id}", # Prefix for uniqueness
+            title=title_element.text.strip(),
+            company=company_element.text.strip(),
+            link=link,
+            source="WeWorkRemotely"
+        )
         jobs.append(job)
         
-    logger.info(f"Scraped {len(jobs)} jobs from WeWorkRemotely.")
+    logger.info(f"Scraped {len(jobs)} jobs from WeWorkRemotely ({skipped} older than the high-water mark).")
     return jobs
\ No newline at end of file
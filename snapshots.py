@@ -0,0 +1,352 @@
+# job_alert_bot/snapshots.py
+#
+# Record/replay archive of source responses, so parsing can be profiled and
+# parser changes checked against real payloads without touching the job boards.
+#
+# Record every response while the bot runs normally:
+#   SNAPSHOT_MODE=record python bot.py
+# List recorded sessions:
+#   python snapshots.py list
+# Replay the latest session offline, scraping only or through the whole pipeline:
+#   python snapshots.py replay [--session NAME] [--timing fast|original] [--pipeline] [--profile out.prof]
+# Drop response bodies no session refers to any more, after deleting old sessions:
+#   python snapshots.py prune
+#
+# The archive is content-addressed: each distinct body is stored once, gzipped,
+# under objects/ named by its SHA-256, and each session is a JSON Lines manifest
+# under sessions/ with one line per fetch: the URL, when it was fetched, how
+# long it took, and the body's hash (null if the fetch failed).
+
+import argparse
+import asyncio
+import cProfile
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+import urllib.parse
+from config import SNAPSHOT_MODE, SNAPSHOT_DIR, SNAPSHOT_SESSION, SNAPSHOT_REPLAY_TIMING
+
+logger = logging.getLogger(__name__)
+
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+TIMING_FAST = "fast"
+TIMING_ORIGINAL = "original"
+
+# The active mode and session, set from config on first use or by start_recording()/start_replay()
+_mode: str | None = None
+_session: str | None = None
+_timing = TIMING_FAST
+# When the session started recording, for the offsets saved with each fetch
+_started_at = 0.0
+# Replay: recorded fetches per URL, in order, and how many of each were served
+_recorded: dict[str, list[dict]] = {}
+_served: dict[str, int] = {}
+# Replay with original timing: when the replay started, and the recorded offset it stands for
+_replay_started = 0.0
+_first_offset = 0.0
+
+
+def _objects_dir() -> str:
+    return os.path.join(SNAPSHOT_DIR, "objects")
+
+
+def _sessions_dir() -> str:
+    return os.path.join(SNAPSHOT_DIR, "sessions")
+
+
+def _object_path(digest: str) -> str:
+    return os.path.join(_objects_dir(), digest[:2], digest + ".gz")
+
+
+def _manifest_path(session: str) -> str:
+    return os.path.join(_sessions_dir(), session + ".jsonl")
+
+
+def list_sessions() -> list[str]:
+    """Returns the recorded sessions, oldest first."""
+    try:
+        names = [name[:-len(".jsonl")] for name in os.listdir(_sessions_dir()) if name.endswith(".jsonl")]
+    except FileNotFoundError:
+        return []
+    return sorted(names, key=lambda name: os.path.getmtime(_manifest_path(name)))
+
+
+def load_session(session: str) -> list[dict]:
+    """Reads a session's manifest, one dict per recorded fetch."""
+    with open(_manifest_path(session), encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_object(digest: str) -> str:
+    """Returns a recorded response body by its hash."""
+    with gzip.open(_object_path(digest), "rt", encoding="utf-8") as f:
+        return f.read()
+
+
+def _write_object(body: bytes, digest: str):
+    """Stores a body under its hash, unless an identical body is already archived."""
+    path = _object_path(digest)
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temporary file first so a crash never leaves a half-written object
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(gzip.compress(body, mtime=0))
+    os.replace(tmp_path, path)
+
+
+def start_recording(session: str | None = None) -> str:
+    """Starts saving fetched responses into a session, a new timestamped one by default. Returns its name."""
+    global _mode, _session, _started_at
+    _mode, _session, _started_at = MODE_RECORD, session or time.strftime("%Y%m%d-%H%M%S"), time.time()
+    os.makedirs(_sessions_dir(), exist_ok=True)
+    logger.info(f"Recording source responses into snapshot session '{_session}'.")
+    return _session
+
+
+def start_replay(session: str | None = None, timing: str = TIMING_FAST) -> str:
+    """
+    Starts serving fetches from a recorded session, the latest one by default.
+
+    Args:
+        session (str): The session to replay.
+        timing (str): TIMING_FAST to answer at once, or TIMING_ORIGINAL to answer
+            each fetch as long after the replay started as it finished after the
+            session's first fetch when it was recorded.
+
+    Returns:
+        str: The session being replayed.
+    """
+    global _mode, _session, _timing, _replay_started, _first_offset
+    if session is None:
+        sessions = list_sessions()
+        if not sessions:
+            raise FileNotFoundError(f"No snapshot sessions recorded in {SNAPSHOT_DIR}.")
+        session = sessions[-1]
+    _recorded.clear()
+    _served.clear()
+    fetches = load_session(session)
+    for fetch in fetches:
+        _recorded.setdefault(fetch["url"], []).append(fetch)
+    _mode, _session, _timing = MODE_REPLAY, session, timing
+    # Start the clock at the first fetch rather than at the recording bot's startup
+    _first_offset = min((fetch["at"] for fetch in fetches), default=0.0)
+    _replay_started = time.monotonic()
+    logger.info(f"Replaying {len(_recorded)} URLs from snapshot session '{session}' ({timing} timing).")
+    return session
+
+
+def stop():
+    """Turns recording or replay off."""
+    global _mode, _session
+    _mode, _session = None, None
+
+
+def mode() -> str | None:
+    """Returns MODE_RECORD, MODE_REPLAY or None, starting the mode set in config on first use."""
+    global _mode
+    if _mode is None and SNAPSHOT_MODE:
+        if SNAPSHOT_MODE == MODE_RECORD:
+            start_recording(SNAPSHOT_SESSION or None)
+        elif SNAPSHOT_MODE == MODE_REPLAY:
+            start_replay(SNAPSHOT_SESSION or None, SNAPSHOT_REPLAY_TIMING)
+        else:
+            logger.warning(f"Unknown SNAPSHOT_MODE '{SNAPSHOT_MODE}'; snapshots are off.")
+            _mode = ""
+    return _mode or None
+
+
+async def record(url: str, text: str | None, started_at: float, elapsed: float):
+    """
+    Adds a fetch to the recording session.
+
+    Args:
+        url (str): The URL fetched.
+        text (str): The response body, or None if the fetch failed.
+        started_at (float): When the fetch started, as a Unix timestamp.
+        elapsed (float): How long the fetch took, retries included, in seconds.
+    """
+    digest = None
+    if text is not None:
+        body = text.encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()
+        try:
+            # Compressing a large page takes a few milliseconds; keep it off the event loop
+            await asyncio.to_thread(_write_object, body, digest)
+        except OSError as e:
+            logger.error(f"Failed to archive response for {url}: {e}")
+            return
+    line = {"url": url, "at": round(started_at - _started_at, 3), "elapsed": round(elapsed, 3), "object": digest}
+    try:
+        with open(_manifest_path(_session), "a", encoding="utf-8") as f:
+            f.write(json.dumps(line) + "\n")
+    except OSError as e:
+        logger.error(f"Failed to record fetch of {url}: {e}")
+
+
+async def replay(url: str) -> str | None:
+    """
+    Returns the recorded body for a URL, or None if that fetch failed or the URL
+    was never recorded. A URL fetched several times is replayed in the same
+    order, repeating its last response once they run out.
+
+    With original timing the response is held back until the replay has run
+    as long as the recording had when the fetch finished, so fetches that
+    overlapped or waited on each other do so again.
+    """
+    fetches = _recorded.get(url)
+    if not fetches:
+        logger.error(f"No snapshot of {url} in session '{_session}'.")
+        return None
+    index = _served.get(url, 0)
+    _served[url] = index + 1
+    fetch = fetches[min(index, len(fetches) - 1)]
+    if _timing == TIMING_ORIGINAL:
+        finished_at = _replay_started + fetch["at"] - _first_offset + fetch["elapsed"]
+        await asyncio.sleep(max(finished_at - time.monotonic(), 0))
+    if fetch["object"] is None:
+        return None
+    try:
+        return await asyncio.to_thread(read_object, fetch["object"])
+    except (OSError, EOFError) as e:
+        logger.error(f"Failed to read snapshot of {url}: {e}")
+        return None
+
+
+def keywords_in_session(session: str) -> list[str]:
+    """Recovers the keywords a session was recorded for from its keyword search URLs."""
+    from cssselectors import SELECTORS
+    patterns = [
+        re.compile(re.escape(selectors["url"]).replace(re.escape("{keyword}"), "([^&]+)") + "$")
+        for selectors in SELECTORS.values() if "{keyword}" in selectors["url"]
+    ]
+    keywords = set()
+    for fetch in load_session(session):
+        for pattern in patterns:
+            match = pattern.match(fetch["url"])
+            if match:
+                keywords.add(urllib.parse.unquote_plus(match.group(1)))
+    return sorted(keywords)
+
+
+# --- Command Line ---
+
+class RecordingBot:
+    """Stands in for aiogram's Bot during a pipeline replay, counting messages instead of sending them."""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.sent += 1
+
+
+async def replay_session(session: str | None, timing: str, pipeline: bool):
+    """
+    Replays a session against a scratch database subscribed to its keywords, so
+    every recorded page is parsed as if it were new.
+    """
+    import database as db
+    import scheduler
+    import scraper
+    from notifier import NotificationDispatcher
+    from parsing import close_executor
+
+    session = start_replay(session, timing)
+    keywords = keywords_in_session(session)
+    with tempfile.TemporaryDirectory() as workdir:
+        db.DATABASE_PATH = os.path.join(workdir, "replay.db")
+        await db.initialize_db()
+        for keyword in keywords:
+            await db.add_subscription(0, keyword)
+
+        started = time.perf_counter()
+        if pipeline:
+            bot = RecordingBot()
+            dispatcher = NotificationDispatcher(bot, rate=1e9, per_chat_interval=0)
+            dispatcher.start()
+            await scheduler.job_processor(bot, dispatcher)
+            await dispatcher.join()
+            await dispatcher.stop()
+            await scheduler.flush_delivered()
+            outcome = f"{bot.sent} alerts"
+        else:
+            jobs = await scraper.scrape_all_sites()
+            outcome = f"{len(jobs)} jobs"
+        elapsed = time.perf_counter() - started
+
+        close_executor()
+        await db.close_db()
+    logger.info(
+        f"Replayed {sum(_served.values())} fetches of {len(_recorded)} URLs for {len(keywords)} keywords "
+        f"from '{session}' in {elapsed:.2f}s: {outcome}."
+    )
+
+
+def print_sessions():
+    for session in list_sessions():
+        fetches = load_session(session)
+        objects = {fetch["object"] for fetch in fetches if fetch["object"]}
+        size = sum(os.path.getsize(_object_path(digest)) for digest in objects if os.path.exists(_object_path(digest)))
+        print(f"{session}: {len(fetches)} fetches, {len(objects)} distinct bodies, {size / 2**20:.1f} MiB compressed")
+
+
+def prune_objects() -> int:
+    """Removes archived bodies that no session refers to. Returns how many were removed."""
+    referenced = {fetch["object"] for session in list_sessions() for fetch in load_session(session)}
+    removed = 0
+    for root, _, names in os.walk(_objects_dir()):
+        for name in names:
+            if name.endswith(".gz") and name[:-len(".gz")] not in referenced:
+                os.remove(os.path.join(root, name))
+                removed += 1
+    logger.info(f"Removed {removed} unreferenced snapshot objects.")
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay recorded source responses.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="List recorded sessions")
+
+    replay_command = commands.add_parser("replay", help="Scrape a recorded session with no network")
+    replay_command.add_argument("--session", help="Session to replay (default: the latest)")
+    replay_command.add_argument("--timing", choices=[TIMING_FAST, TIMING_ORIGINAL], default=TIMING_FAST)
+    replay_command.add_argument("--pipeline", action="store_true", help="Run matching and delivery too, via job_processor")
+    replay_command.add_argument("--profile", metavar="FILE", help="Save a cProfile of the replay to FILE, parsing inline")
+
+    commands.add_parser("prune", help="Remove archived bodies no session refers to")
+
+    args = parser.parse_args()
+    if args.command == "list":
+        print_sessions()
+    elif args.command == "prune":
+        prune_objects()
+    else:
+        profiler = None
+        if args.profile:
+            # Parse in this process, or the profile would miss the parser pool's work
+            import parsing
+            parsing.PARSE_EXECUTOR = "inline"
+            profiler = cProfile.Profile()
+            profiler.enable()
+        asyncio.run(replay_session(args.session, args.timing, args.pipeline))
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            logger.info(f"Profile saved to {args.profile} (view it with python -m pstats {args.profile}).")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    # Run through the importable module, so the mode set here is the one scraper.py sees
+    import snapshots
+    snapshots.main()
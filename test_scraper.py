@@ -2,14 +2,9 @@
 
 import asyncio
 import logging
-import importlib
-import pkgutil
-import urllib.parse
 
 # --- CORE IMPORTS FROM YOUR PROJECT ---
-from scraper import run_scraper # We will use the 'run_scraper' function directly
-from cssselectors import SELECTORS
-import scrapers # This is the package in the 'scrapers/' folder
+from scraper import run_scraper, build_fetch_plan, load_scraper_modules # We will use the 'run_scraper' function directly
 from config import LOGGING_LEVEL
 # --- CONFIGURATION FOR THIS TEST ---
 # Add any keywords you want to test here
@@ -40,27 +35,13 @@ async def main():
     processed_job_ids = set() # To prevent showing duplicate jobs
     tasks = []
 
-    # Dynamically load all scraper modules from the 'scrapers/' folder
-    scraper_modules = {
-        name: importlib.import_module(f"scrapers.{name}")
-        for _, name, _ in pkgutil.iter_modules(scrapers.__path__)
-    }
-
-    # Loop through each website defined in your selectors
-    for site_name, selectors in SELECTORS.items():
-        if site_name not in scraper_modules:
-            logger.warning(f"No scraper module found for '{site_name}', skipping.")
-            continue
-            
-        # For each website, loop through our test keywords
-        for keyword in KEYWORDS_TO_TEST:
-            # Prepare the URL for the search
-            safe_keyword = urllib.parse.quote_plus(keyword)
-            url = selectors['url'].format(keyword=safe_keyword)
-            
-            # Create a task to scrape that specific URL
-            module = scraper_modules[site_name]
-            tasks.append(run_scraper(site_name, module, selectors, url))
+    # Dynamically load all scraper modules from the 'scrapers/' folder and
+    # collapse (website x keyword) into one scrape per distinct URL
+    plan = build_fetch_plan(KEYWORDS_TO_TEST, load_scraper_modules())
+    for url, (site_name, module, selectors) in plan.items():
+        # Create a task to scrape that specific URL. No filter_unposted is passed,
+        # so paginated sources page through to max_pages without asking the database
+        tasks.append(run_scraper(site_name, module, selectors, url))
 
     # Run all the scraping tasks concurrently
     results = await asyncio.gather(*tasks)
@@ -69,9 +50,9 @@ async def main():
     for job_list in results:
         if job_list:
             for job in job_list:
-                if job['id'] not in processed_job_ids:
+                if job.id not in processed_job_ids:
                     all_jobs.append(job)
-                    processed_job_ids.add(job['id'])
+                    processed_job_ids.add(job.id)
 
     # --- Display the results ---
     if all_jobs:
@@ -79,10 +60,10 @@ async def main():
         logger.info("--- First 5 Jobs Found ---")
         for i, job in enumerate(all_jobs[:5]):
             print(f"  Job {i+1}:")
-            print(f"    Title: {job['title']}")
-            print(f"    Company: {job['company']}")
-            print(f"    Source: {job['source']}")
-            print(f"    Link: {job['link']}")
+            print(f"    Title: {job.title}")
+            print(f"    Company: {job.company}")
+            print(f"    Source: {job.source}")
+            print(f"    Link: {job.link}")
     else:
         logger.warning("\n[INFO] No jobs were found.")
 
@@ -0,0 +1,127 @@
+# job_alert_bot/webhook_replay.py
+#
+# Exercises webhook mode locally, without contacting Telegram.
+#
+# 1. Start a stub Bot API that records the bot's replies:
+#      python webhook_replay.py stub --port 8081
+# 2. Start the bot against it, without registering the webhook:
+#      TELEGRAM_API_SERVER=http://localhost:8081 TELEGRAM_BOT_TOKEN=123456:TEST \
+#      BOT_MODE=webhook WEBHOOK_REGISTER=false WEBHOOK_SECRET=local python bot.py
+# 3. Post recorded Update payloads to it:
+#      python webhook_replay.py post updates.jsonl --secret local
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from aiohttp import ClientSession, web
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def load_updates(path: str) -> list[dict]:
+    """
+    Loads recorded updates from a JSON file (one update or a list), a JSON Lines
+    file, or a directory of such files.
+    """
+    if os.path.isdir(path):
+        updates = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith((".json", ".jsonl")):
+                updates.extend(load_updates(os.path.join(path, name)))
+        return updates
+
+    with open(path, encoding="utf-8") as f:
+        content = f.read().strip()
+    if path.endswith(".jsonl"):
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+    data = json.loads(content)
+    return data if isinstance(data, list) else [data]
+
+
+async def post_updates(updates: list[dict], url: str, secret: str, delay: float):
+    """Posts each update to the webhook and reports status codes and latency."""
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    latencies = []
+    async with ClientSession() as session:
+        for update in updates:
+            start = time.perf_counter()
+            async with session.post(url, json=update, headers=headers) as response:
+                await response.read()
+                latency = time.perf_counter() - start
+                latencies.append(latency)
+                logger.info(f"update_id={update.get('update_id')} -> HTTP {response.status} in {latency * 1000:.1f} ms")
+            if delay:
+                await asyncio.sleep(delay)
+
+    if latencies:
+        latencies.sort()
+        logger.info(
+            f"Posted {len(latencies)} updates. "
+            f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms."
+        )
+
+
+async def run_stub_api(host: str, port: int):
+    """Serves a minimal Bot API that accepts every call and logs what the bot sent."""
+    message_ids = iter(range(1, 1 << 31))
+
+    async def handle_method(request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        logger.info(f"{method}: {params}")
+
+        if method.lower() == "sendmessage":
+            result = {
+                "message_id": next(message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        elif method.lower() == "getme":
+            result = {"id": 123456, "is_bot": True, "first_name": "Stub", "username": "stub_bot"}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", handle_method)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Stub Bot API listening on http://{host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded Telegram updates against the bot's webhook.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    post = commands.add_parser("post", help="POST recorded updates to a running webhook server")
+    post.add_argument("path", help="JSON/JSONL file or directory of recorded updates")
+    post.add_argument("--url", default="http://localhost:8080/webhook")
+    post.add_argument("--secret", default=os.getenv("WEBHOOK_SECRET", ""))
+    post.add_argument("--delay", type=float, default=0.0, help="Seconds to wait between updates")
+
+    stub = commands.add_parser("stub", help="Run a stub Bot API that records replies")
+    stub.add_argument("--host", default="127.0.0.1")
+    stub.add_argument("--port", type=int, default=8081)
+
+    args = parser.parse_args()
+    if args.command == "post":
+        asyncio.run(post_updates(load_updates(args.path), args.url, args.secret, args.delay))
+    else:
+        try:
+            asyncio.run(run_stub_api(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
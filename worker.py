@@ -0,0 +1,379 @@
+# job_alert_bot/worker.py
+#
+# Worker mode: scraping, matching and delivery as separately scalable processes
+# that coordinate through a work queue in the bot's SQLite database.
+#
+#   python worker.py scrape [--concurrency N]   # run as many as the job boards allow
+#   python worker.py match                      # one leader schedules and matches; extras stand by
+#   python worker.py notify [--shard K]         # one per WORK_NOTIFY_SHARDS shard
+#
+# The matcher holding the leader lock queues one scrape task per distinct URL
+# in the fetch plan on each source's schedule. Scrape workers claim them, and
+# queue the jobs they find for the matcher, which deduplicates and matches them
+# and queues alerts for the notifier workers. Run bot.py with WORKERS_ENABLED=true
+# alongside, so it only answers commands.
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+import database as db
+import metrics
+import scheduler
+import scraper
+from bot import create_bot
+from config import (
+    LOGGING_LEVEL, NOTIFY_GLOBAL_RATE, WORK_POLL_INTERVAL, WORK_RETRY_DELAY, WORK_SCRAPE_BATCH,
+    WORK_MATCH_BATCH, WORK_NOTIFY_BATCH, WORK_NOTIFY_SHARDS, LEADER_LOCK_TTL, WORK_VISIBILITY_TIMEOUT,
+    WORK_ERROR_BACKOFF_MAX
+)
+from cssselectors import SELECTORS
+from jobs import Job
+from notifier import NotificationDispatcher
+from parsing import close_executor
+
+logger = logging.getLogger(__name__)
+
+SCRAPE_QUEUE = "scrape"
+MATCH_QUEUE = "match"
+LEADER_LOCK = "scheduler"
+
+
+def notify_queue(chat_id: int) -> str:
+    """Returns the notify queue a chat's alerts go to, so one notifier owns each chat."""
+    return f"notify:{chat_id % WORK_NOTIFY_SHARDS}"
+
+
+class QueueDispatcher:
+    """
+    Stands in for NotificationDispatcher in the matcher, queueing alerts for the
+    notifier workers instead of sending them. Alerts are written in batches;
+    call flush() once a batch of jobs has been matched.
+    """
+
+    def __init__(self, batch_size: int = WORK_NOTIFY_BATCH):
+        self.batch_size = batch_size
+        self._pending: dict[str, list[dict]] = {}
+        self._callbacks = []
+        self._count = 0
+
+    async def enqueue(self, chat_id: int, text: str, on_done=None):
+        """Adds an alert to the batch. on_done is called once it is safely in a notify queue."""
+        self._pending.setdefault(notify_queue(chat_id), []).append({"chat_id": chat_id, "text": text})
+        if on_done is not None:
+            self._callbacks.append(on_done)
+        self._count += 1
+        if self._count >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        pending, self._pending, self._count = self._pending, {}, 0
+        callbacks, self._callbacks = self._callbacks, []
+        for queue, payloads in pending.items():
+            await db.enqueue_tasks(queue, payloads)
+        # The notify queue is durable, so for the matcher's outbox the alerts are delivered
+        for on_done in callbacks:
+            on_done()
+
+
+async def _idle(stop: asyncio.Event, seconds: float, wake: asyncio.Event | None = None):
+    """Sleeps for a while, waking early if the worker is asked to stop or wake is set."""
+    waiters = [asyncio.ensure_future(event.wait()) for event in (stop, wake) if event is not None]
+    _, pending = await asyncio.wait(waiters, timeout=seconds, return_when=asyncio.FIRST_COMPLETED)
+    for waiter in pending:
+        waiter.cancel()
+
+
+async def _back_off(stop: asyncio.Event, role: str, error: Exception, failures: int):
+    """Logs an unexpected error in a worker loop and waits longer the more loops have failed in a row."""
+    logger.error(f"{role.capitalize()} worker loop failed ({failures} in a row): {error}", exc_info=True)
+    await _idle(stop, min(WORK_POLL_INTERVAL * 2 ** (failures - 1), WORK_ERROR_BACKOFF_MAX))
+
+
+# --- Scrape Workers ---
+
+async def run_scrape_worker(stop: asyncio.Event, concurrency: int = WORK_SCRAPE_BATCH):
+    """Claims scrape tasks and queues the jobs found on each URL for the matcher."""
+    modules = scraper.load_scraper_modules()
+    failures = 0
+    while not stop.is_set():
+        try:
+            tasks = await db.claim_tasks(SCRAPE_QUEUE, concurrency)
+            if not tasks:
+                await _idle(stop, WORK_POLL_INTERVAL)
+                continue
+            watermarks = await db.get_source_watermarks()
+            # A failed task's lease runs out and it is retried, so one failure doesn't stop the others
+            results = await asyncio.gather(
+                *(_scrape_task(task, modules, watermarks) for task in tasks), return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Scrape task failed: {result}", exc_info=result)
+            failures = 0
+        except Exception as e:
+            failures += 1
+            await _back_off(stop, "scrape", e, failures)
+
+
+async def _scrape_task(task: tuple, modules: dict, watermarks: dict):
+    """Scrapes one URL. Failed fetches go back to the queue to be retried later."""
+    task_id, token, payload, attempts = task
+    url, site_name = payload["url"], payload["source"]
+    selectors = SELECTORS.get(site_name)
+    module = modules.get(selectors.get("module", site_name)) if selectors else None
+    if module is None:
+        logger.warning(f"No scraper for source '{site_name}', dropping task for {url}.")
+        await db.complete_task(task_id, token)
+        return
+
+    jobs = await scraper.run_scraper(site_name, module, selectors, url, watermarks.get(url), db.filter_unposted_jobs)
+    if jobs is None:
+        await db.release_task(task_id, token, delay=WORK_RETRY_DELAY * attempts)
+        return
+    # The watermark and validators travel with the jobs and are saved once the matcher records them
+    await db.enqueue_tasks(MATCH_QUEUE, [{
+        "url": url, "jobs": [job.as_record() for job in jobs], "pending": scraper.export_pending(url)
+    }])
+    if not await db.complete_task(task_id, token):
+        logger.warning(f"Lease on {url} expired before it was scraped; another worker may scrape it again.")
+
+
+# --- Matcher ---
+
+async def schedule_source(source: str):
+    """Scheduled per source on the leader: queues one scrape task per distinct URL."""
+    keywords = await db.get_all_unique_keywords()
+    if not keywords:
+        logger.info("No keywords to scrape for.")
+        return
+    plan = scraper.build_fetch_plan(keywords, scraper.load_scraper_modules(), [source])
+    added = await db.enqueue_tasks(
+        SCRAPE_QUEUE,
+        [{"url": url, "source": site_name} for url, (site_name, _, _) in plan.items()],
+        list(plan),
+    )
+    logger.info(f"Queued {added} of {len(plan)} URLs for {source}; the rest were still queued.")
+
+
+async def match_pending(dispatcher: QueueDispatcher) -> int:
+    """
+    Claims scraped pages, then deduplicates and matches their jobs as one batch.
+
+    Digest users get one digest per batch rather than per scheduled run, since
+    pages of a run may arrive over a long time from many workers.
+
+    Returns:
+        int: The number of pages processed.
+    """
+    tasks = await db.claim_tasks(MATCH_QUEUE, WORK_MATCH_BATCH)
+    if not tasks:
+        return 0
+    urls, jobs, seen = set(), [], set()
+    for _, _, payload, _ in tasks:
+        url = payload["url"]
+        urls.add(url)
+        scraper.import_pending(url, payload["pending"])
+        for record in payload["jobs"]:
+            # Tasks queued before jobs were sent as records still hold dicts
+            job = Job(**record) if isinstance(record, dict) else Job(*record)
+            if job.id not in seen:
+                seen.add(job.id)
+                jobs.append(job)
+
+    await scheduler.process_jobs(jobs, urls, None, dispatcher)
+    await dispatcher.flush()
+    await asyncio.gather(*(db.complete_task(task_id, token) for task_id, token, _, _ in tasks))
+    return len(tasks)
+
+
+async def _keep_leadership(owner: str, lost: asyncio.Event):
+    """
+    Renews the leader lock every third of its TTL for as long as the matcher
+    leads, however long a batch takes. Sets lost once another matcher holds the
+    lock, or renewals have failed for a whole TTL and one may have taken over.
+    """
+    renewed_at = time.monotonic()
+    while True:
+        await asyncio.sleep(LEADER_LOCK_TTL / 3)
+        try:
+            if not await db.acquire_leader(LEADER_LOCK, owner, LEADER_LOCK_TTL):
+                break
+            renewed_at = time.monotonic()
+        except Exception as e:
+            logger.error(f"Failed to renew the leader lock: {e}")
+            if time.monotonic() - renewed_at >= LEADER_LOCK_TTL:
+                break
+    lost.set()
+
+
+async def run_matcher(stop: asyncio.Event):
+    """
+    Competes for the leader lock. The leader schedules every source and matches
+    scraped pages, renewing the lock in the background; the others wait to take
+    over if it stops renewing it.
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    dispatcher = QueueDispatcher()
+    job_scheduler = None
+    renewer = None
+    lost = asyncio.Event()
+
+    async def step_down():
+        nonlocal job_scheduler, renewer
+        if job_scheduler is not None:
+            job_scheduler.shutdown(wait=False)
+        if renewer is not None:
+            renewer.cancel()
+            await asyncio.gather(renewer, return_exceptions=True)
+        job_scheduler = renewer = None
+
+    failures = 0
+    try:
+        while not stop.is_set():
+            try:
+                if renewer is None and await db.acquire_leader(LEADER_LOCK, owner, LEADER_LOCK_TTL):
+                    logger.info(f"{owner} is now the leader.")
+                    lost.clear()
+                    renewer = asyncio.create_task(_keep_leadership(owner, lost))
+                    try:
+                        # Finish runs the previous leader was matching when it stopped
+                        await scheduler.resume_runs(None, dispatcher)
+                        await dispatcher.flush()
+                        job_scheduler = scheduler.setup_scheduler(stage=schedule_source)
+                    except Exception:
+                        # Let a standby, or this matcher on its next try, take over from the start
+                        await step_down()
+                        await db.release_leader(LEADER_LOCK, owner)
+                        raise
+                if renewer is not None and lost.is_set():
+                    logger.warning(f"{owner} lost the leader lock; standing by.")
+                    await step_down()
+
+                # Keep going while there is a backlog, checking the lock is still ours before each batch
+                if not (renewer is not None and await match_pending(dispatcher)):
+                    await _idle(stop, WORK_POLL_INTERVAL)
+                failures = 0
+            except Exception as e:
+                # Claimed match tasks whose batch failed are retried once their leases run out
+                failures += 1
+                await _back_off(stop, "match", e, failures)
+    finally:
+        await scheduler.flush_delivered()
+        if renewer is not None:
+            await step_down()
+            await db.release_leader(LEADER_LOCK, owner)
+
+
+# --- Notifier Workers ---
+
+async def run_notifier(stop: asyncio.Event, shard: int = 0, rate: float = NOTIFY_GLOBAL_RATE / WORK_NOTIFY_SHARDS):
+    """
+    Claims alerts from one notify shard and sends them through a NotificationDispatcher.
+
+    Up to WORK_NOTIFY_BATCH alerts are in flight at once, and each is removed
+    from the queue as soon as it is sent or dropped, so one busy chat doesn't
+    hold back the rest. Leases on alerts still waiting in the dispatcher, e.g.
+    behind a chat's rate limit, are extended so no notifier claims them again.
+    """
+    queue = f"notify:{shard}"
+    bot = create_bot()
+    dispatcher = NotificationDispatcher(bot, rate=rate)
+    dispatcher.start()
+    # Lease token of every alert handed to the dispatcher and not yet finished, by task ID
+    in_flight: dict[int, str] = {}
+    finished = []
+    # Set once enough alerts have finished to be worth claiming more
+    room = asyncio.Event()
+    extended_at = time.monotonic()
+
+    def on_done(task_id: int):
+        finished.append((task_id, in_flight.pop(task_id)))
+        if len(in_flight) <= WORK_NOTIFY_BATCH // 2:
+            room.set()
+
+    async def complete_finished():
+        done = finished[:]
+        await asyncio.gather(*(db.complete_task(task_id, token) for task_id, token in done))
+        del finished[:len(done)]
+
+    failures = 0
+    try:
+        while not stop.is_set():
+            try:
+                await complete_finished()
+                if time.monotonic() - extended_at >= WORK_VISIBILITY_TIMEOUT / 3:
+                    await db.extend_leases(list(in_flight.items()))
+                    extended_at = time.monotonic()
+                if len(in_flight) > WORK_NOTIFY_BATCH // 2:
+                    room.clear()
+                    await _idle(stop, WORK_POLL_INTERVAL, wake=room)
+                    continue
+                tasks = await db.claim_tasks(queue, WORK_NOTIFY_BATCH - len(in_flight))
+                for task_id, token, payload, _ in tasks:
+                    if task_id in in_flight:
+                        # Its lease ran out while it waited in the dispatcher; keep the new one, don't send it twice
+                        in_flight[task_id] = token
+                        continue
+                    in_flight[task_id] = token
+                    await dispatcher.enqueue(payload["chat_id"], payload["text"], on_done=lambda task_id=task_id: on_done(task_id))
+                if not tasks:
+                    await _idle(stop, WORK_POLL_INTERVAL)
+                failures = 0
+            except Exception as e:
+                failures += 1
+                await _back_off(stop, "notify", e, failures)
+    finally:
+        # Alerts still waiting in the dispatcher go back to the queue when their leases expire
+        await dispatcher.stop()
+        await complete_finished()
+        await bot.session.close()
+
+
+async def main(args: argparse.Namespace):
+    logging.basicConfig(
+        level=getattr(logging, LOGGING_LEVEL.upper(), logging.INFO),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    await db.initialize_db()
+
+    # Finish the current batch on SIGINT/SIGTERM instead of abandoning its leases
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    metrics_runner = await metrics.start_metrics_server(args.metrics_port) if args.metrics_port else None
+    logger.info(f"Starting {args.role} worker...")
+    try:
+        if args.role == "scrape":
+            await run_scrape_worker(stop, args.concurrency)
+        elif args.role == "match":
+            await run_matcher(stop)
+        else:
+            await run_notifier(stop, args.shard)
+    finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await scraper.close_client()
+        close_executor()
+        await db.close_db()
+        logger.info(f"{args.role.capitalize()} worker stopped.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one job alert worker process.")
+    parser.add_argument("role", choices=["scrape", "match", "notify"])
+    parser.add_argument("--concurrency", type=int, default=WORK_SCRAPE_BATCH, help="URLs a scrape worker fetches at once")
+    parser.add_argument("--shard", type=int, default=0, help="Notify shard to deliver, below WORK_NOTIFY_SHARDS")
+    parser.add_argument("--metrics-port", type=int, default=0, help="Serve /metrics on this port (0 disables it)")
+    args = parser.parse_args()
+    if not 0 <= args.shard < WORK_NOTIFY_SHARDS:
+        parser.error(f"--shard must be between 0 and {WORK_NOTIFY_SHARDS - 1}")
+    asyncio.run(main(args))